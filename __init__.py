@@ -30,12 +30,17 @@ import sys
 import pprint
 import atexit
 import string
+import hashlib
 import platform
 import contextlib
 import subprocess
 import glob as _glob
+import SCons.Util # pylint: disable=import-error
+import SCons.Action # pylint: disable=import-error
 import SCons.Script # pylint: disable=import-error
 from . import devtoolset
+from . import cachedir
+from . import probecache
 
 # pylint: disable=global-statement
 # pylint: disable=bare-except, broad-except
@@ -83,7 +88,9 @@ args_cache_path = None
 args_cache = None
 args_cache_echo = False
 args_no_cache = False
+src_dir = None
 bld_dir = None
+bld_root = None
 out_dir = None
 mode_dir = None
 arch_dir = "x86" if platform.architecture()[0] == '32bit' else "x64"
@@ -99,6 +106,9 @@ ignore_help = False
 help_targets = {}
 help_options = {}
 ext_types = {}
+compiler_launcher = None
+compiler_launcher_stats = None
+linker = None
 
 @contextlib.contextmanager
 def toggle_help(on):
@@ -209,14 +219,17 @@ def glob(pat):
 
 def InitGlobals(output_dir=".", force=False):
     global args_cache, args_cache_path, args_no_cache
-    global bld_dir, out_dir, mode_dir, arch_dir
+    global src_dir, bld_dir, bld_root, out_dir, mode_dir, arch_dir
     global mscver, gccver, no_arch, warnl, issued_warnings, printed_messages
     global all_targets, all_progress
     global ignore_help, help_targets, help_options
-    global ext_types
+    global ext_types, compiler_launcher, linker
 
     if bld_dir is None or force:
+        src_dir = abspath(".")
         bld_dir = abspath("./.build")
+        # Resolved in MakeBaseEnv (see SetupBuildRoot)
+        bld_root = None
 
     if out_dir is None or force:
         if not output_dir:
@@ -256,6 +269,8 @@ def InitGlobals(output_dir=".", force=False):
         help_targets = {}
         help_options = {}
         ext_types = {}
+        compiler_launcher = None
+        linker = None
 
 
 class Cache(dict):
@@ -447,6 +462,45 @@ def Which(target):
 
     return None
 
+_DefineExp = re.compile(r"^\s*#\s*define\s+(\w+)(?:\s+(.*?))?\s*$")
+_HeaderDefines = {}
+
+def HeaderDefines(path, names):
+    # Extract values of object-like macros defined in a header file (i.e. SDK version numbers)
+    #   Reading stops as soon as all requested macros are found, missing macros are not in
+    #   returned dictionary. Results are cached per path and modification time for the
+    #   current run and in probe cache.
+    names = sorted(set([names] if isinstance(names, anystring) else names))
+    filekey = probecache.FileKey(path)
+    if filekey is None:
+        return {}
+
+    key = "%s|%s" % (filekey, ",".join(names))
+    rv = _HeaderDefines.get(key, None)
+    if rv is not None:
+        return rv
+
+    rv = probecache.Get("headers", key)
+    if rv is None:
+        rv = {}
+        remain = set(names)
+        with io.open(path, "r", encoding="UTF-8", errors="replace", newline="\n") as f:
+            for line in f:
+                if not "define" in line:
+                    continue
+                m = _DefineExp.match(line)
+                if m and m.group(1) in remain:
+                    # First definition wins, strip trailing comments
+                    rv[m.group(1)] = re.sub(r"/\*.*?(\*/|$)|//.*$", "", m.group(2) or "").strip()
+                    remain.remove(m.group(1))
+                    if not remain:
+                        break
+        probecache.Set("headers", key, rv)
+
+    _HeaderDefines[key] = rv
+
+    return rv
+
 def NoConsole(env):
     if str(SCons.Script.Platform()) == "win32":
         env.Append(LINKFLAGS=" /subsystem:windows /entry:mainCRTStartup")
@@ -502,6 +556,11 @@ def SetRPath(env, settings, relpath=None, rpaths=None):
             if not rpath in all_rpaths:
                 all_rpaths.append(rpath)
 
+        # Paths added by 'custom' functions (i.e. external shared libraries directories)
+        for rpath in env.get("RPATHS", []):
+            if not rpath in all_rpaths:
+                all_rpaths.append(rpath)
+
         for i in xrange(len(all_rpaths)):
             path = all_rpaths[i]
             if path is None:
@@ -843,12 +902,890 @@ def NormalizedRelativePath(path, baseDirectory):
 def NormalizedRelativePaths(paths, baseDirectory):
     return [NormalizedRelativePath(x, baseDirectory) for x in paths]
 
+_Deciders = {"MD5": "MD5",
+             "content": "MD5",
+             "MD5-timestamp": "MD5-timestamp",
+             "content-timestamp": "MD5-timestamp",
+             "timestamp-newer": "timestamp-newer",
+             "make": "timestamp-newer",
+             "timestamp-match": "timestamp-match"}
+
+def GetDecider(name):
+    decider = _Deciders.get(name, None)
+    if decider is None:
+        WarnOnce("Invalid decider \"%s\". Should be one of: %s." % (name, ", ".join(sorted(_Deciders.keys()))))
+    return decider
+
+def SetupDecider(env, name):
+    decider = GetDecider(name)
+    if decider is not None:
+        env.Decider(decider)
+    return decider
+
+def SetupHashing():
+    hashfmt = GetArgument("hash-format", None)
+    if hashfmt:
+        try:
+            SCons.Script.SetOption("hash_format", hashfmt)
+        except Exception as e:
+            WarnOnce("Hash format '%s' not supported by this version of SCons (%s)." % (hashfmt, e))
+
+    # 0 keeps SCons default
+    chunksize = GetArgument("hash-chunksize", 0, int)
+    if chunksize > 0:
+        for opt in ("hash_chunksize", "md5_chunksize"):
+            try:
+                SCons.Script.SetOption(opt, chunksize)
+                break
+            except:
+                pass
+
+def SetupBuildRoot():
+    global src_dir, bld_dir, bld_root
+
+    if bld_root is not None:
+        return
+
+    bld_root = GetArgument("bld-dir", os.environ.get("EXCONS_BUILD_DIR", ""))
+    if not bld_root:
+        return
+
+    # Intermediate files for several source trees may live side by side in the same directory
+    #   -> use a sub-directory keyed by the source root path
+    key = hashlib.sha1(src_dir.encode("UTF-8")).hexdigest()[:12]
+    bld_dir = joinpath(abspath(os.path.expanduser(bld_root)), "%s-%s" % (os.path.basename(src_dir), key))
+
+    if not os.path.isdir(bld_dir):
+        try:
+            os.makedirs(bld_dir)
+        except Exception as e:
+            WarnOnce("Could not create build directory '%s' (%s)" % (bld_dir, e))
+            sys.exit(1)
+
+    srcfile = joinpath(bld_dir, "source")
+    if not os.path.isfile(srcfile):
+        with io.open(srcfile, "w", newline="\n", encoding="UTF-8") as f:
+            f.write(u"%s\n" % src_dir)
+
+    SCons.Script.SConsignFile(joinpath(bld_dir, ".sconsign"))
+
+    PrintOnce("Using build directory: %s" % bld_dir)
+
+def CompilerLauncher():
+    global compiler_launcher
+
+    if compiler_launcher is None:
+        compiler_launcher = ""
+        launcher = GetArgument("compiler-launcher", "")
+        if launcher:
+            if sys.platform == "win32":
+                WarnOnce("'compiler-launcher' is not supported on windows.")
+            elif os.path.isfile(launcher):
+                compiler_launcher = abspath(launcher)
+            else:
+                path = Which("%s$" % launcher)
+                if path is None:
+                    WarnOnce("Could not find compiler launcher '%s' in PATH." % launcher)
+                else:
+                    compiler_launcher = path
+    return compiler_launcher
+
+def CompilerLauncherName():
+    return os.path.splitext(os.path.basename(CompilerLauncher()))[0]
+
+def CompilerLauncherEnv():
+    env = {}
+    name = CompilerLauncherName()
+    if name == "ccache":
+        # Rewrite absolute paths below source root as relative ones when hashing
+        # Current directory doesn't need to be hashed as debug info paths are re-mapped (see SetupCompilerLauncher)
+        env["CCACHE_BASEDIR"] = src_dir
+        env["CCACHE_NOHASHDIR"] = "1"
+    elif name == "sccache":
+        env["SCCACHE_BASEDIRS"] = src_dir
+    for k in ("CCACHE_DIR", "CCACHE_MAXSIZE", "SCCACHE_DIR", "SCCACHE_CACHE_SIZE"):
+        if k in os.environ:
+            env[k] = os.environ[k]
+    return env
+
+def _CompilerLauncherStats():
+    launcher = CompilerLauncher()
+    name = CompilerLauncherName()
+    env = os.environ.copy()
+    env.update(CompilerLauncherEnv())
+    try:
+        if name == "ccache":
+            out = subprocess.check_output([launcher, "--print-stats"], env=env, stderr=subprocess.STDOUT)
+            stats = {}
+            for line in out.decode("UTF-8").split("\n"):
+                spl = line.strip().split("\t")
+                if len(spl) == 2 and spl[1].isdigit():
+                    stats[spl[0]] = int(spl[1])
+            return (stats.get("direct_cache_hit", 0) + stats.get("preprocessed_cache_hit", 0), stats.get("cache_miss", 0))
+        elif name == "sccache":
+            import json
+            out = subprocess.check_output([launcher, "--show-stats", "--stats-format=json"], env=env, stderr=subprocess.STDOUT)
+            stats = json.loads(out.decode("UTF-8"))["stats"]
+            return (sum(stats["cache_hits"]["counts"].values()), sum(stats["cache_misses"]["counts"].values()))
+    except Exception:
+        pass
+    return None
+
+def _PrintCompilerLauncherStats():
+    if compiler_launcher_stats is not None:
+        stats = _CompilerLauncherStats()
+        if stats is not None:
+            hits = stats[0] - compiler_launcher_stats[0]
+            misses = stats[1] - compiler_launcher_stats[1]
+            total = hits + misses
+            if total > 0:
+                Print("%d hit(s), %d miss(es) (%d%% hit rate)" % (hits, misses, int(100 * float(hits) / total)), tool=CompilerLauncherName())
+
+def SetupCompilerLauncher(env):
+    global compiler_launcher_stats
+
+    launcher = CompilerLauncher()
+    if not launcher:
+        return
+
+    env["COMPILER_LAUNCHER"] = launcher
+    # Prefix command lines rather than CC/CXX to leave $SHCC -> $CC chains and *COMSTR untouched
+    for k in ("CCCOM", "SHCCCOM", "CXXCOM", "SHCXXCOM"):
+        if not str(env[k]).startswith("$COMPILER_LAUNCHER "):
+            env[k] = "$COMPILER_LAUNCHER " + env[k]
+    env["ENV"].update(CompilerLauncherEnv())
+
+    # Make debug info independent of the checkout location
+    env.Append(CCFLAGS=["-fdebug-prefix-map=%s=." % src_dir])
+
+    if compiler_launcher_stats is None and not SCons.Script.GetOption("clean") and not SCons.Script.GetOption("help"):
+        compiler_launcher_stats = _CompilerLauncherStats()
+        if compiler_launcher_stats is not None:
+            atexit.register(_PrintCompilerLauncherStats)
+
+# Linker name -> executables to look for in PATH
+Linkers = {"bfd": ["ld.bfd", "ld"],
+           "gold": ["ld.gold"],
+           "lld": ["ld.lld"],
+           "mold": ["ld.mold", "mold"]}
+
+def _FindInPath(name, path):
+    for d in path.split(os.pathsep):
+        p = joinpath(d.strip(), name)
+        if d.strip() and os.path.isfile(p) and os.access(p, os.X_OK):
+            return p
+    return None
+
+def LinkerName():
+    # Name of the linker selected with 'linker=' flag or an empty string for compiler default
+    return (linker[0] if linker else "")
+
+def _GCCMajorVersion():
+    try:
+        return int(gccver.split(".")[0])
+    except:
+        return 0
+
+def SetupLinker(env):
+    global linker
+
+    name = GetArgument("linker", "")
+    if not name:
+        return
+
+    if name not in Linkers:
+        WarnOnce("Unsupported linker '%s' (one of %s)." % (name, ", ".join(sorted(Linkers.keys()))))
+        return
+
+    # Use the environment PATH that includes devtoolset directories
+    path = env["ENV"].get("PATH", os.environ.get("PATH", ""))
+    exe = None
+    for bn in Linkers[name]:
+        exe = _FindInPath(bn, path)
+        if exe:
+            break
+    if exe is None:
+        WarnOnce("Could not find '%s' linker in PATH, use compiler default." % name)
+        return
+
+    gccmaj = _GCCMajorVersion()
+    if name == "mold" and gccmaj and gccmaj < 12:
+        # -fuse-ld=mold was added in gcc 12, mold installs a 'ld' symlink for older compilers
+        libexec = joinpath(os.path.dirname(os.path.dirname(os.path.realpath(exe))), "libexec", "mold")
+        if not os.path.isfile(joinpath(libexec, "ld")):
+            WarnOnce("'mold' linker requires gcc 12 or above.")
+            return
+        env.Append(LINKFLAGS=" -B%s" % libexec)
+    elif name == "lld" and gccmaj and gccmaj < 9:
+        WarnOnce("'lld' linker requires gcc 9 or above.")
+        return
+    else:
+        env.Append(LINKFLAGS=" -fuse-ld=%s" % name)
+
+    # Note: SHLINKFLAGS and LDMODULEFLAGS are based on LINKFLAGS
+    threads = GetArgument("linker-threads", 0, int)
+    if name == "gold":
+        # gold is single threaded by default
+        env.Append(LINKFLAGS=" -Wl,--threads")
+        if threads > 0:
+            env.Append(LINKFLAGS=" -Wl,--thread-count=%d" % threads)
+    elif name in ("lld", "mold") and threads > 0:
+        env.Append(LINKFLAGS=" -Wl,--threads=%d" % threads)
+
+    linker = (name, exe)
+
+    PrintOnce("Using linker: %s (%s)" % (name, exe))
+
+def DebugInfoMode():
+    mode = GetArgument("debug-info", "full")
+    if mode not in ("full", "split", "compressed", "minimal"):
+        WarnOnce("Invalid 'debug-info' value '%s', use 'full'." % mode)
+        mode = "full"
+    elif mode in ("split", "compressed") and str(SCons.Script.Platform()) != "posix":
+        WarnOnce("'debug-info=%s' is only supported on linux, use 'full'." % mode)
+        mode = "full"
+    elif mode == "split" and LTOMode() != "off":
+        # gcc silently disables -gsplit-dwarf with -flto: no .dwo files would be produced
+        WarnOnce("'debug-info=split' is not supported with LTO, use 'full'.")
+        mode = "full"
+    return mode
+
+def SplitDebugInfo():
+    return (str(SCons.Script.Platform()) == "posix" and DebugInfoMode() == "split")
+
+def SetupGCCDebugInfo(env):
+    mode = DebugInfoMode()
+    if mode == "minimal":
+        # Line tables only: enough for backtraces
+        env.Append(CPPFLAGS=" -g1")
+    else:
+        env.Append(CPPFLAGS=" -g -ggdb")
+        if mode == "split":
+            # Debug info goes to .dwo files next to objects and is not processed by the linker
+            env.Append(CCFLAGS=" -gsplit-dwarf")
+            if LinkerName() in ("gold", "lld", "mold"):
+                env.Append(LINKFLAGS=" -Wl,--gdb-index")
+        elif mode == "compressed":
+            env.Append(CCFLAGS=" -gz")
+            env.Append(LINKFLAGS=" -gz")
+
+def _AddSplitDebugInfo(penv, objs):
+    # Declare .dwo files written next to objects by -gsplit-dwarf
+    dwos = []
+    for o in objs:
+        dwo = os.path.splitext(str(o))[0] + ".dwo"
+        penv.SideEffect(dwo, o)
+        penv.Clean(o, dwo)
+        # Side effects are not stored in derived files cache
+        penv.NoCache(o)
+        dwos.append(dwo)
+    return dwos
+
+def _SplitDebugInfoPackages(penv, nodes, dwos):
+    # Bundle .dwo files referenced by binaries into <binary>.dwp (looked up by gdb next to the binary)
+    if "DWP" not in penv:
+        path = penv["ENV"].get("PATH", os.environ.get("PATH", ""))
+        # binutils' dwp doesn't support DWARF 5 (gcc 11 default)
+        dwp = _FindInPath("llvm-dwp", path) or _FindInPath("dwp", path)
+        if dwp is None:
+            WarnOnce("Could not find 'llvm-dwp' or 'dwp' tool in PATH, skip debug info packages.")
+            return []
+        penv["DWP"] = dwp
+    pkgs = []
+    for node in nodes:
+        if "OBJCOPY" in penv:
+            # Binary is stripped by the link action (see _AddSeparateDebugInfo): read skeleton units from debug file
+            cmd = "$DWP -e \"%s\" -o $TARGET" % DebugInfoFile(node)
+        else:
+            cmd = "$DWP -e $SOURCE -o $TARGET"
+        pkg = penv.Command(str(node) + ".dwp", node, SCons.Script.Action(cmd, "Packaging debug info $TARGET ..."))
+        penv.Depends(pkg, dwos)
+        pkgs.extend(pkg)
+    return pkgs
+
+def SeparateDebugInfoEnabled():
+    return (str(SCons.Script.Platform()) == "posix" and GetArgument("separate-debug-info", 0, int) != 0)
+
+def DebugInfoDirectory():
+    path = GetArgument("debug-dir", "")
+    if path:
+        return abspath(os.path.expanduser(path))
+    return joinpath(OutputBaseDirectory(), ".debug")
+
+def DebugInfoFile(binary):
+    binary = abspath(str(binary))
+    root = abspath(OutputBaseDirectory())
+    if binary.startswith(root + "/"):
+        rel = binary[len(root)+1:]
+    else:
+        rel = os.path.basename(binary)
+    return joinpath(DebugInfoDirectory(), rel + ".debug")
+
+def _ReadBuildID(env, path):
+    p = subprocess.Popen([env["READELF"], "-n", path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, _ = p.communicate()
+    if p.returncode == 0:
+        m = re.search(r"Build ID:\s*([0-9a-fA-F]+)", out.decode("UTF-8", "replace"))
+        if m:
+            return m.group(1).lower()
+    return None
+
+def _BuildIDLink(bid):
+    # gdb looks up '<debug-file-directory>/.build-id/xx/yyyy.debug'
+    return joinpath(DebugInfoDirectory(), ".build-id", bid[:2], bid[2:] + ".debug")
+
+def _SeparateDebugInfo(target, source, env): # pylint: disable=unused-argument
+    binary = str(target[0])
+    dbgfile = DebugInfoFile(binary)
+    dbgdir = os.path.dirname(dbgfile)
+    if not os.path.isdir(dbgdir):
+        try:
+            os.makedirs(dbgdir)
+        except:
+            # Concurrent creation
+            pass
+
+    for cmd in ([env["OBJCOPY"], "--only-keep-debug", binary, dbgfile],
+                [env["OBJCOPY"], "--strip-unneeded", "--add-gnu-debuglink=%s" % dbgfile, binary]):
+        rv = subprocess.call(cmd)
+        if rv != 0:
+            return rv
+
+    bid = _ReadBuildID(env, binary)
+    if bid and len(bid) > 2:
+        lnk = _BuildIDLink(bid)
+        lnkdir = os.path.dirname(lnk)
+        try:
+            if not os.path.isdir(lnkdir):
+                os.makedirs(lnkdir)
+            if os.path.lexists(lnk):
+                os.remove(lnk)
+            os.symlink(os.path.relpath(dbgfile, lnkdir), lnk)
+        except Exception as e:
+            WarnOnce("Failed to create build-id link for %s (%s)" % (binary, e))
+
+    return None
+
+def SetupSeparateDebugInfo(env):
+    if not SeparateDebugInfoEnabled():
+        return
+
+    if GetArgument("strip", 0, int):
+        WarnOnce("'separate-debug-info' ignored when 'strip' is set.")
+        return
+
+    path = env["ENV"].get("PATH", os.environ.get("PATH", ""))
+    objcopy = _FindInPath("objcopy", path)
+    readelf = _FindInPath("readelf", path)
+    if objcopy is None or readelf is None:
+        WarnOnce("Could not find 'objcopy' or 'readelf' in PATH, ignore 'separate-debug-info'.")
+        return
+
+    env["OBJCOPY"] = objcopy
+    env["READELF"] = readelf
+    env.Append(LINKFLAGS=" -Wl,--build-id")
+
+def _AddSeparateDebugInfo(penv, nodes):
+    # Runs as part of the link job, so that separation of many targets happens in parallel with -j
+    for node in nodes:
+        penv.AddPostAction(node, SCons.Script.Action(_SeparateDebugInfo, "Separating debug info $TARGET ..."))
+        dbgfile = DebugInfoFile(node)
+        penv.SideEffect(dbgfile, node)
+        penv.Clean(node, dbgfile)
+        if SCons.Script.GetOption("clean") and os.path.isfile(str(node)):
+            # build-id link name is only known once the binary is linked: read it from the current one
+            bid = _ReadBuildID(penv, str(node))
+            if bid and len(bid) > 2:
+                penv.Clean(node, _BuildIDLink(bid))
+        # Binaries retrieved from cache are already stripped and come without their debug file
+        penv.NoCache(node)
+
+def IsClang(env):
+    return (sys.platform == "darwin" or "clang" in os.path.basename(env.subst("$CC")))
+
+def LTOMode():
+    mode = GetArgument("lto", "off")
+    if mode not in ("off", "full", "thin"):
+        WarnOnce("Invalid 'lto' value '%s', use 'off'." % mode)
+        mode = "off"
+    return mode
+
+def _LTOJobs():
+    # Number of parallel LTO code generation jobs per link
+    njobs = GetArgument("lto-jobs", 0, int)
+    if njobs > 0:
+        return njobs
+    sconsjobs = SCons.Script.GetOption("num_jobs")
+    if sconsjobs > 1:
+        # Links run concurrently: share available cores
+        return max(1, CPUCount() // sconsjobs)
+    return 0
+
+def SetupLTO(env):
+    mode = LTOMode()
+    if mode == "off":
+        return
+
+    path = env["ENV"].get("PATH", os.environ.get("PATH", ""))
+    njobs = _LTOJobs()
+    ccflags = []
+    linkflags = []
+
+    if IsClang(env):
+        ccflags.append("-flto=%s" % mode)
+        linkflags.append("-flto=%s" % mode)
+        if mode == "thin":
+            cachedir = joinpath(BuildBaseDirectory(), "thinlto-cache")
+            lnk = LinkerName()
+            if sys.platform == "darwin":
+                linkflags.append("-Wl,-cache_path_lto,%s" % cachedir)
+            elif lnk == "lld":
+                linkflags.extend(["-Wl,--thinlto-cache-dir=%s" % cachedir, "-Wl,--thinlto-cache-policy=prune_after=168h"])
+                if njobs > 0:
+                    linkflags.append("-Wl,--thinlto-jobs=%d" % njobs)
+            elif lnk == "gold":
+                linkflags.extend(["-Wl,-plugin-opt,cache-dir=%s" % cachedir, "-Wl,-plugin-opt,cache-policy=prune_after=168h"])
+                if njobs > 0:
+                    linkflags.append("-Wl,-plugin-opt,jobs=%d" % njobs)
+            else:
+                WarnOnce("ThinLTO cache requires 'linker=lld' or 'linker=gold'.")
+        ar = _FindInPath("llvm-ar", path)
+        ranlib = _FindInPath("llvm-ranlib", path)
+    else:
+        if mode == "thin":
+            WarnOnce("ThinLTO is not supported by gcc, use 'lto=full'.")
+        if njobs > 0:
+            flag = "-flto=%d" % njobs
+        elif _GCCMajorVersion() >= 10:
+            # Use make jobserver if available or all cores
+            flag = "-flto=auto"
+        else:
+            flag = "-flto=%d" % CPUCount()
+        ccflags.append(flag)
+        linkflags.extend([flag, "-fuse-linker-plugin"])
+        # Static libraries contain GIMPLE bytecode only: requires linker plugin aware archiver
+        ar = _FindInPath("gcc-ar", path)
+        ranlib = _FindInPath("gcc-ranlib", path)
+
+    if ar and ranlib:
+        env["AR"] = ar
+        env["RANLIB"] = ranlib
+    else:
+        WarnOnce("Could not find LTO aware 'ar' and 'ranlib', static libraries may not link.")
+
+    # Use variables so that targets can opt-out (see 'lto' target setting)
+    env["LTO_CCFLAGS"] = ccflags
+    env["LTO_LINKFLAGS"] = linkflags
+    env.Append(CCFLAGS=["$LTO_CCFLAGS"])
+    env.Append(LINKFLAGS=["$LTO_LINKFLAGS"])
+
+    PrintOnce("Using %s LTO" % mode)
+
+def PGOMode():
+    mode = GetArgument("pgo", "off")
+    if mode not in ("off", "generate", "use"):
+        WarnOnce("Invalid 'pgo' value '%s', use 'off'." % mode)
+        mode = "off"
+    elif mode != "off" and str(SCons.Script.Platform()) == "win32":
+        WarnOnce("'pgo' is not supported on windows.")
+        mode = "off"
+    return mode
+
+def _PGOSeparateBuild():
+    # gcc names profile files after objects path: -fprofile-prefix-path (gcc 11) makes them relative
+    #   to the build directory so that instrumented objects can be built in a separate directory
+    return (sys.platform == "darwin" or _GCCMajorVersion() >= 11)
+
+def PGOProfileDirectory():
+    path = GetArgument("pgo-dir", "")
+    if path:
+        return abspath(os.path.expanduser(path))
+    return joinpath(bld_dir, "pgo", os.path.relpath(BuildBaseDirectory(variant=False), bld_dir))
+
+def _PGOMergeProfiles(env, profdir):
+    # clang raw profiles need to be merged before use
+    profdata = joinpath(profdir, "merged.profdata")
+    raws = glob(joinpath(profdir, "*.profraw"))
+    if not raws:
+        return profdata
+    newest = max([os.path.getmtime(x) for x in raws])
+    if os.path.isfile(profdata) and os.path.getmtime(profdata) >= newest:
+        return profdata
+    path = env["ENV"].get("PATH", os.environ.get("PATH", ""))
+    llvmprofdata = _FindInPath("llvm-profdata", path)
+    if llvmprofdata is None:
+        WarnOnce("Could not find 'llvm-profdata' in PATH, cannot merge profiles.")
+        return profdata
+    Print("Merge %d profile(s) into %s" % (len(raws), profdata), tool="pgo")
+    if subprocess.call([llvmprofdata, "merge", "-o", profdata] + raws) != 0:
+        WarnOnce("Failed to merge profiles in %s" % profdir)
+    return profdata
+
+def SetupPGO(env):
+    mode = PGOMode()
+    if mode == "off":
+        return
+
+    profdir = PGOProfileDirectory()
+    # excons always builds with -pthread: use atomic counters updates by default
+    update = GetArgument("pgo-update", "atomic")
+    ccflags = []
+    linkflags = []
+
+    if IsClang(env):
+        if mode == "generate":
+            ccflags = ["-fprofile-generate=%s" % profdir, "-fprofile-update=%s" % update]
+            linkflags = ["-fprofile-generate=%s" % profdir]
+        else:
+            profdata = _PGOMergeProfiles(env, profdir)
+            ccflags = ["-fprofile-use=%s" % profdata, "-Wprofile-instr-out-of-date", "-Wprofile-instr-missing"]
+            linkflags = ["-fprofile-use=%s" % profdata]
+    else:
+        prefixpath = []
+        if _PGOSeparateBuild():
+            prefixpath = ["-fprofile-prefix-path=%s" % BuildBaseDirectory()]
+        else:
+            WarnOnce("gcc 11 or above is required to build instrumented objects in a separate directory.")
+        if mode == "generate":
+            ccflags = ["-fprofile-generate=%s" % profdir, "-fprofile-update=%s" % update] + prefixpath
+            linkflags = ["-fprofile-generate=%s" % profdir]
+        else:
+            # Report missing and stale profiles as warnings rather than errors
+            ccflags = ["-fprofile-use=%s" % profdir, "-Wmissing-profile", "-Wno-error=coverage-mismatch"] + prefixpath
+            if _GCCMajorVersion() >= 10:
+                # Don't optimize code not run during training for size
+                ccflags.append("-fprofile-partial-training")
+            linkflags = ["-fprofile-use=%s" % profdir]
+
+    # Use variables so that targets can opt-out (see 'pgo' target setting)
+    env["PGO_CCFLAGS"] = ccflags
+    env["PGO_LINKFLAGS"] = linkflags
+    env.Append(CCFLAGS=["$PGO_CCFLAGS"])
+    env.Append(LINKFLAGS=["$PGO_LINKFLAGS"])
+
+    PrintOnce("PGO %s, profile directory: %s" % (mode, profdir))
+
+def _PGOProfileFile(penv, obj):
+    # Profile data used when compiling obj
+    profdir = PGOProfileDirectory()
+    if IsClang(penv):
+        return joinpath(profdir, "merged.profdata")
+    # gcc reads '<profdir>/<mangled object path without extension>.gcda'
+    rel = os.path.relpath(os.path.splitext(abspath(str(obj)))[0], BuildBaseDirectory())
+    if not _PGOSeparateBuild():
+        rel = abspath(os.path.splitext(str(obj))[0])
+    return joinpath(profdir, rel.replace("/", "#") + ".gcda")
+
+def _PGOProfileStatus(penv, objs, srcs):
+    # Returns (number of objects without profile, number of sources modified after profile)
+    missing, stale = 0, 0
+    if IsClang(penv):
+        profdata = _PGOProfileFile(penv, None)
+        if not os.path.isfile(profdata):
+            return (len(objs), 0)
+        ptime = os.path.getmtime(profdata)
+        for src in srcs:
+            if os.path.isfile(str(src)) and os.path.getmtime(str(src)) > ptime:
+                stale += 1
+    else:
+        for obj, src in zip(objs, srcs):
+            gcda = _PGOProfileFile(penv, obj)
+            if not os.path.isfile(gcda):
+                missing += 1
+            elif os.path.isfile(str(src)) and os.path.getmtime(str(src)) > os.path.getmtime(gcda):
+                stale += 1
+    return (missing, stale)
+
+def _AddTraining(penv, prj, pout, cmds, name="pgo-train"):
+    # Training commands are run by '<name>' alias, use $SOURCE to refer to the target binary
+    if not isinstance(cmds, (list, tuple)):
+        cmds = [cmds]
+    # Note: CommandAction as Action() would treat a lone '$SOURCE' as a lazy variable action
+    actions = []
+    for cmd in cmds:
+        if callable(cmd):
+            actions.append(SCons.Script.Action(cmd, "Training %s ..." % prj))
+        else:
+            actions.append(SCons.Action.CommandAction(cmd, cmdstr="Training %s ..." % prj))
+    alias = SCons.Script.Alias("%s-%s" % (name, prj), pout, actions)
+    SCons.Script.AlwaysBuild(alias)
+    SCons.Script.Alias(name, alias)
+
+def BOLTMode():
+    mode = GetArgument("bolt", "off")
+    if mode not in ("off", "instrument", "optimize"):
+        WarnOnce("Invalid 'bolt' value '%s', use 'off'." % mode)
+        mode = "off"
+    elif mode != "off" and str(SCons.Script.Platform()) != "posix":
+        WarnOnce("'bolt' is only supported on linux.")
+        mode = "off"
+    return mode
+
+def BOLTProfileDirectory():
+    path = GetArgument("bolt-dir", "")
+    if path:
+        return abspath(os.path.expanduser(path))
+    return joinpath(bld_dir, "bolt", os.path.relpath(BuildBaseDirectory(variant=False), bld_dir))
+
+def _BOLTProfileName(binary):
+    binary = abspath(str(binary))
+    root = abspath(OutputBaseDirectory())
+    rel = (binary[len(root)+1:] if binary.startswith(root + "/") else os.path.basename(binary))
+    return joinpath(BOLTProfileDirectory(), rel.replace("/", "_"))
+
+def _BOLTMergeProfiles(penv, prefix):
+    # Instrumented binaries write one <prefix>.<pid>.fdata file per run
+    fdata = prefix + ".fdata"
+    raws = glob(prefix + ".*.fdata")
+    if not raws:
+        return (fdata if os.path.isfile(fdata) else None)
+    newest = max([os.path.getmtime(x) for x in raws])
+    if os.path.isfile(fdata) and os.path.getmtime(fdata) >= newest:
+        return fdata
+    mergefdata = _FindInPath("merge-fdata", penv["ENV"].get("PATH", os.environ.get("PATH", "")))
+    if mergefdata is None:
+        WarnOnce("Could not find 'merge-fdata' in PATH, cannot merge BOLT profiles.")
+        return None
+    Print("Merge %d profile(s) into %s" % (len(raws), fdata), tool="bolt")
+    with open(fdata, "wb") as f:
+        if subprocess.call([mergefdata] + raws, stdout=f) != 0:
+            WarnOnce("Failed to merge BOLT profiles for %s" % prefix)
+            return None
+    return fdata
+
+def SetupBOLT(penv):
+    # Relocations are required for function reordering, add them for both modes so that
+    #   instrumented and optimized binaries come from the same link
+    if "BOLT" not in penv:
+        bolt = _FindInPath("llvm-bolt", penv["ENV"].get("PATH", os.environ.get("PATH", "")))
+        if bolt is None:
+            WarnOnce("Could not find 'llvm-bolt' in PATH, ignore 'bolt'.")
+            return False
+        penv["BOLT"] = bolt
+    penv.Append(LINKFLAGS=" -Wl,--emit-relocs")
+    return True
+
+def _AddBOLT(penv, prj, nodes):
+    mode = BOLTMode()
+    profdir = BOLTProfileDirectory()
+
+    for node in nodes:
+        prefix = _BOLTProfileName(node)
+        if mode == "instrument":
+            opts = "-instrument -instrumentation-file=%s -instrumentation-file-append-pid" % prefix
+        else:
+            fdata = _BOLTMergeProfiles(penv, prefix)
+            if fdata is None:
+                WarnOnce("%s: no BOLT profile data for %s, skip optimization" % (prj, node), tool="bolt")
+                continue
+            opts = GetArgument("bolt-opts", "-reorder-blocks=ext-tsp -reorder-functions=hfsort -split-functions -split-all-cold -split-eh -dyno-stats")
+            opts = "-data=%s %s" % (fdata, opts)
+            # Re-optimize when profile changes
+            penv.Depends(node, fdata)
+        # Replace binary in output directory (runs before target 'post' actions)
+        cmd = "$BOLT $TARGET -o ${TARGET}.bolt %s && mv -f ${TARGET}.bolt $TARGET" % opts
+        if mode == "instrument":
+            # Instrumented binaries don't create the profile directory: do it when they are built
+            penv.AddPostAction(node, SCons.Script.Mkdir(profdir))
+        penv.AddPostAction(node, SCons.Action.CommandAction(cmd, cmdstr="BOLT %s $TARGET ..." % ("instrumenting" if mode == "instrument" else "optimizing")))
+        penv.Clean(node, str(node) + ".bolt")
+
+# ISA level -> __builtin_cpu_supports features (checked by generated dispatchers)
+ISAFeatures = {"x86-64-v2": ["popcnt", "sse3", "ssse3", "sse4.1", "sse4.2"],
+               "x86-64-v3": ["avx", "avx2", "bmi", "bmi2", "fma"],
+               "x86-64-v4": ["avx512f", "avx512bw", "avx512cd", "avx512dq", "avx512vl"]}
+
+def _ISAName(isa):
+    return "excons_isa_%s" % re.sub(r"[^A-Za-z0-9_]", "_", isa)
+
+def ISAVariants(settings):
+    variants = settings.get("isa_variants", [])
+    if not variants:
+        return []
+    # Dispatchers rely on ELF indirect functions
+    if str(SCons.Script.Platform()) != "posix" or arch_dir != "x64":
+        WarnOnce("%s: 'isa_variants' only supported on linux x64, build default variant only." % settings["name"])
+        return []
+    if settings["type"] == "testprograms":
+        WarnOnce("%s: 'isa_variants' not supported for testprograms." % settings["name"])
+        return []
+    rv = []
+    for isa in variants:
+        if isa not in ISAFeatures:
+            WarnOnce("%s: unknown ISA '%s' (add its features to excons.ISAFeatures)." % (settings["name"], isa))
+        else:
+            rv.append(isa)
+    return rv
+
+def _ISAObjects(penv, odir, bnnoext, src, variants, shared):
+    # Default variant uses target flags, others add -march. Each variant wraps its code
+    #   between EXCONS_ISA_BEGIN and EXCONS_ISA_END in its own namespace
+    ext = (".os" if shared else ".o")
+    builder = (penv.SharedObject if shared else penv.StaticObject)
+    objs = []
+    cppdefines = list(penv.get("CPPDEFINES", []))
+    for isa in [None] + variants:
+        name = _ISAName("default" if isa is None else isa)
+        defs = [("EXCONS_ISA_BEGIN", "namespace %s {" % name), ("EXCONS_ISA_END", "}")]
+        if isa is None:
+            objs.extend(builder(joinpath(odir, bnnoext + ext), src, CPPDEFINES=cppdefines + defs))
+        else:
+            objs.extend(builder(joinpath(odir, "%s_%s%s" % (bnnoext, name[len("excons_isa_"):], ext)), src,
+                                CPPDEFINES=cppdefines + defs + [("EXCONS_ISA", isa.replace("-", "_"))],
+                                CCFLAGS=list(penv.get("CCFLAGS", [])) + ["-march=%s" % isa]))
+    return objs
+
+def _ISADispatcherSource(variants, functions, headers):
+    lines = ["// Generated by excons: do not edit", ""]
+    for hdr in headers:
+        lines.append("#include \"%s\"" % hdr)
+    if headers:
+        lines.append("")
+
+    names = sorted(functions.keys())
+    for i, fn in enumerate(names):
+        lines.append("typedef %s;" % re.sub(r"^(.*?)\(", r"\1 excons_isa_fn_%d(" % i, functions[fn], count=1))
+    lines.append("")
+
+    for isa in [None] + variants:
+        ns = _ISAName("default" if isa is None else isa)
+        for i, fn in enumerate(names):
+            spl = fn.split("::")
+            lines.append("namespace %s { %sexcons_isa_fn_%d %s;%s }" % (ns, "".join(["namespace %s { " % x for x in spl[:-1]]), i, spl[-1], " }" * (len(spl) - 1)))
+    lines.append("")
+
+    lines.append("extern \"C\" {")
+    for i, fn in enumerate(names):
+        lines.append("static excons_isa_fn_%d* excons_isa_resolve_%d(void)" % (i, i))
+        lines.append("{")
+        lines.append("    __builtin_cpu_init();")
+        # Variants are listed from least to most capable
+        for isa in reversed(variants):
+            cond = " && ".join(["__builtin_cpu_supports(\"%s\")" % x for x in ISAFeatures[isa]])
+            lines.append("    if (%s) return &%s::%s;" % (cond, _ISAName(isa), fn))
+        lines.append("    return &%s::%s;" % (_ISAName("default"), fn))
+        lines.append("}")
+    lines.append("}")
+    lines.append("")
+
+    for i, fn in enumerate(names):
+        spl = fn.split("::")
+        lines.append("%sexcons_isa_fn_%d %s __attribute__((ifunc(\"excons_isa_resolve_%d\")));%s" % ("".join(["namespace %s { " % x for x in spl[:-1]]), i, spl[-1], i, " }" * (len(spl) - 1)))
+
+    return "\n".join(lines) + "\n"
+
+def _WriteValue(target, source, env): # pylint: disable=unused-argument
+    with io.open(str(target[0]), "w", newline="\n", encoding="UTF-8") as f:
+        f.write(source[0].get_text_contents())
+    return None
+
+def _ISADispatcher(penv, odir, prj, settings, variants, shared):
+    functions = settings.get("isa_functions", {})
+    if not functions:
+        WarnOnce("%s: no 'isa_functions' to dispatch." % prj)
+        return []
+    content = _ISADispatcherSource(variants, functions, settings.get("isa_headers", []))
+    src = penv.Command(joinpath(odir, "%s_isa_dispatch.cpp" % prj), SCons.Script.Value(content), SCons.Script.Action(_WriteValue, "Generating $TARGET ..."))
+    if shared:
+        return penv.SharedObject(joinpath(odir, "%s_isa_dispatch.os" % prj), src)
+    else:
+        return penv.StaticObject(joinpath(odir, "%s_isa_dispatch.o" % prj), src)
+
+def CPUCount():
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except:
+        return 1
+
+def DistWorkers():
+    return GetArgument("dist-workers", os.environ.get("EXCONS_DIST_WORKERS", ""))
+
+def SetupDistCompile(env):
+    workers = DistWorkers()
+    if not workers:
+        return
+
+    if PGOMode() != "off":
+        # Profile flags refer to local profile files: workers would reject every job
+        WarnOnce("'dist-workers' is ignored with 'pgo', compile locally.")
+        return
+
+    script = joinpath(os.path.dirname(abspath(__file__)), "distcompile.py")
+    env["ENV"]["EXCONS_DIST_WORKERS"] = workers
+    env["ENV"]["EXCONS_DIST_TIMEOUT"] = str(GetArgument("dist-timeout", 300.0, float))
+    if sys.platform != "darwin" and gccver:
+        # Workers reject jobs if their compiler version doesn't match
+        env["ENV"]["EXCONS_DIST_VERSION"] = gccver
+    if "EXCONS_DIST_VERBOSE" in os.environ:
+        env["ENV"]["EXCONS_DIST_VERBOSE"] = os.environ["EXCONS_DIST_VERBOSE"]
+
+    name = CompilerLauncherName()
+    if CompilerLauncher():
+        if name != "ccache":
+            WarnOnce("'dist-workers' can only be combined with 'ccache' compiler launcher.")
+            return
+        # ccache runs the distributed compile wrapper on cache misses
+        wrapper = joinpath(bld_dir, "distcompile.sh")
+        content = "#!/bin/sh\nexec \"%s\" \"%s\" compile \"$@\"\n" % (sys.executable, script)
+        if not os.path.isfile(wrapper) or open(wrapper).read() != content:
+            if not os.path.isdir(bld_dir):
+                os.makedirs(bld_dir)
+            with open(wrapper, "w") as f:
+                f.write(content)
+            os.chmod(wrapper, 0o755)
+        env["ENV"]["CCACHE_PREFIX"] = wrapper
+    else:
+        env["DIST_COMPILE"] = "\"%s\" \"%s\" compile" % (sys.executable, script)
+        for k in ("CCCOM", "SHCCCOM", "CXXCOM", "SHCXXCOM"):
+            if not str(env[k]).startswith("$DIST_COMPILE "):
+                env[k] = "$DIST_COMPILE " + env[k]
+
+    PrintOnce("Distribute compilation to: %s" % workers)
+
+def SourceDateEpoch():
+    if "SOURCE_DATE_EPOCH" in os.environ:
+        return os.environ["SOURCE_DATE_EPOCH"]
+    # Default to last commit date
+    try:
+        p = subprocess.Popen(["git", "log", "-1", "--format=%ct"], cwd=src_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        out, _ = p.communicate()
+        if p.returncode == 0:
+            out = (out.decode("ascii") if sys.version_info.major > 2 else out).strip()
+            if out.isdigit():
+                return out
+    except:
+        pass
+    return "0"
+
+def SetupReproducible(env):
+    if str(SCons.Script.Platform()) == "win32":
+        WarnOnce("'reproducible' is not supported on windows.")
+        return
+
+    # Remove build location from debug info, __FILE__ and assertions
+    #   (-ffile-prefix-map is only available from gcc 8)
+    prefixmap = "-ffile-prefix-map"
+    if sys.platform != "darwin" and 0 < _GCCMajorVersion() < 8:
+        prefixmap = "-fdebug-prefix-map"
+    env.Append(CCFLAGS=["%s=%s=." % (prefixmap, src_dir), "%s=%s=.build" % (prefixmap, BuildBaseDirectory())])
+
+    # Used by compiler for __DATE__ and __TIME__
+    env["ENV"]["SOURCE_DATE_EPOCH"] = SourceDateEpoch()
+
+    if sys.platform != "darwin":
+        # Zero timestamps, uids and gids in archives
+        env["ARFLAGS"] = "rcD"
+        env["RANLIBFLAGS"] = "-D"
+
 def MakeBaseEnv(noarch=None, output_dir="."):
     global bld_dir, out_dir, mode_dir, arch_dir, mscver, gccver, no_arch, warnl, ext_types
 
     with toggle_args_cache(False):
         InitGlobals(output_dir, force=(GetArgument("shared-build", "1", int) == 0))
 
+    SetupBuildRoot()
+
     no_arch = (GetArgument("no-arch", 1, int) == 1)
 
     warnl = GetArgument("warnings", "all")
@@ -906,7 +1843,8 @@ def MakeBaseEnv(noarch=None, output_dir="."):
                 env.Append(CCFLAGS="-m32")
                 env.Append(LINKFLAGS="-m32")
 
-        env.Append(CPPFLAGS=" -O0 -g -ggdb")
+        env.Append(CPPFLAGS=" -O0")
+        SetupGCCDebugInfo(env)
         env.Append(CPPDEFINES=["_DEBUG"])
 
     def SetupGCCRelease(env):
@@ -950,7 +1888,8 @@ def MakeBaseEnv(noarch=None, output_dir="."):
                 env.Append(CCFLAGS="-m32")
                 env.Append(LINKFLAGS="-m32")
 
-        env.Append(CPPFLAGS=" -O3 -g -ggdb")
+        env.Append(CPPFLAGS=" -O3")
+        SetupGCCDebugInfo(env)
         env.Append(CPPDEFINES=["NDEBUG"])
 
     SetupRelease = None
@@ -1045,6 +1984,9 @@ def MakeBaseEnv(noarch=None, output_dir="."):
             cppflags += " -Werror"
         env.Append(CPPFLAGS=cppflags)
 
+        SetupCompilerLauncher(env)
+        SetupDistCompile(env)
+
         SetupRelease = SetupGCCRelease
         SetupDebug = SetupGCCDebug
         if GetArgument("with-debug-info", 0, int):
@@ -1080,6 +2022,9 @@ def MakeBaseEnv(noarch=None, output_dir="."):
                 SetArgument("use-c++11", 1)
                 env.Append(CXXFLAGS=" -std=c++11")
 
+            SetupLinker(env)
+            SetupSeparateDebugInfo(env)
+
         def symlink(source, target, env):
             srcpath = str(source[0])
             tgtpath = str(target[0])
@@ -1110,6 +2055,20 @@ def MakeBaseEnv(noarch=None, output_dir="."):
     env["TARGET_ARCH"] = arch_dir
     env["TARGET_MODE"] = mode_dir
 
+    if GetArgument("reproducible", 0, int):
+        SetupReproducible(env)
+
+    if str(SCons.Script.Platform()) != "win32":
+        SetupLTO(env)
+        SetupPGO(env)
+
+    # Dependency change detection
+    SetupHashing()
+    SetupDecider(env, GetArgument("decider", "MD5"))
+
+    # Derived files cache
+    cachedir.Setup(env)
+
     # Progress
     env["PROGRESS"] = ""
 
@@ -1197,7 +2156,7 @@ def OutputBaseDirectory():
     else:
         return joinpath(out_dir, mode_dir)
 
-def BuildBaseDirectory():
+def BuildBaseDirectory(variant=True):
     global bld_dir, mode_dir, arch_dir, mscver, gccver
 
     odir = joinpath(bld_dir, mode_dir, sys.platform, arch_dir)
@@ -1207,6 +2166,9 @@ def BuildBaseDirectory():
     else:
         if gccver:
             odir = joinpath(odir, "gcc-%s" % gccver)
+        if variant and PGOMode() == "generate" and _PGOSeparateBuild():
+            # Keep instrumented objects apart
+            odir = joinpath(odir, "pgo-generate")
     return odir
 
 def Call(path, targets=None, overrides=None, imp=None, keepflags=None): # pylint: disable=redefined-outer-name
@@ -1254,6 +2216,34 @@ def GetOptionsString():
   debug=0|1                       : Build in debug mode                                              [0]
   shared-build=0|1                : Use same output and intermediate file directories for submodules [1]
   with-debug-info=0|1             : Build with debug info                                            [0]
+  debug-info=<str>                : Debug info generation mode for debug and with-debug-info builds  [full] (linux/mac)
+                                    One of 'full' (-g -ggdb), 'split' (-gsplit-dwarf, linux only),
+                                    'compressed' (-gz, linux only) or 'minimal' (-g1)
+  lto=off|full|thin               : Link time optimization ('thin' requires clang)                  [off]  (linux/mac)
+                                    ThinLTO cache is stored in build directory
+  lto-jobs=<int>                  : Number of parallel LTO jobs per link                             [auto]
+                                    (defaults to available cores divided by SCons jobs)
+  pgo=off|generate|use            : Profile guided optimization                                      [off]  (linux/mac)
+                                    'generate' builds instrumented binaries in a separate build directory,
+                                    then use 'pgo-train' target to run targets' training commands
+  pgo-dir=<path>                  : Profile data directory                                           [<blddir>/pgo/...]
+  pgo-update=atomic|single        : Profile counters update method for instrumented builds           [atomic]
+  bolt=off|instrument|optimize    : BOLT post-link optimization of targets with 'bolt_train' key     [off]  (linux)
+                                    'instrument' replaces binaries with instrumented ones,
+                                    then use 'bolt-train' target to run targets' training commands
+  bolt-dir=<path>                 : BOLT profile data directory                                      [<blddir>/bolt/...]
+  bolt-opts=<str>                 : llvm-bolt optimization options
+  separate-debug-info=0|1         : Move debug info of binaries to build-id keyed files and strip them [0]    (linux)
+  debug-dir=<path>                : Separated debug info directory (see separate-debug-info)         [<outdir>/<mode>/<arch>/.debug]
+  debug-info-package=0|1          : Bundle split debug info in a .dwp file next to binaries          [0]    (linux)
+  bld-config-hash=0|1             : Use a separate intermediate directory for each combination of    [0]
+                                    compiler flags, defines and include paths (for example when
+                                    switching between versions of a 'with-xxx' dependency)
+                                    Outputs are shared and re-linked: combine with cache-dir to reuse them
+  bld-dir=<path>                  : Root directory for intermediate files and SCons signatures       [./.build]
+                                    Files are stored in a sub-directory keyed by the source
+                                    root path. EXCONS_BUILD_DIR environment variable is used
+                                    when flag is not set
   stack-size=<str>                : Setup stack size in bytes                                        [system default]
                                     Letters 'k', and 'm' can be used
                                     to specify kilobytes and megabytes
@@ -1264,10 +2254,51 @@ def GetOptionsString():
                                     When set to 'subdir', use '<prefix>/lib/x86' or '<prefix>/lib/x64'
                                     When set to 'suffix', use '<prefix>/lib' or '<prefix>/lib64'
   show-cmds=0|1                   : Show build commands                                              [0]
+  reproducible=0|1                : Remove build location and time from outputs                      [0]    (linux/mac)
+                                    Target sources are linked in sorted order
+                                    Use 'reprocheck.py' script to verify outputs are reproducible
+  cache-dir=<path>                : Share built files through SCons derived files cache directory    []
+                                    A sub-directory is used per build mode, platform, architecture
+                                    and compiler version
+  cache-size=<str>                : Maximum cache directory size, least recently used files are       []
+                                    removed at the end of the build (i.e. 500m, 20g)
+                                    Use 'scons cache-prune' to only prune the cache
+  remote-cache=<url>              : Remote derived files cache (http://, https:// or file://)        []
+                                    Objects are downloaded to the local cache directory
+                                    ('cache-dir' or '<bld-dir>/cache') and uploaded in background
+                                    (see cacheserver.py for a reference server)
+  remote-cache-readonly=0|1       : Don't upload built files to remote cache                         [0]
+  remote-cache-timeout=<float>    : Remote cache request timeout in seconds                          [5]
+  remote-cache-flush-timeout=<float>
+                                  : Seconds to wait for pending uploads at the end of the build      [60]
+                                    (remaining uploads are abandoned)
+  probe-cache=0|1                 : Reuse results of tools probes stored in '<bld-dir>/probes'       [1]
+                                    (i.e. llvm-config output), set to 0 to probe again
+  decider=<str>                   : Method used to detect dependency changes                         [MD5]
+                                    One of 'MD5' (or 'content'), 'MD5-timestamp' (or 'content-timestamp'),
+                                    'timestamp-newer' (or 'make') and 'timestamp-match'
+  xxx-decider=<str>               : Override decider for 'xxx'
+                                    where xxx can be one of the following:
+                                      - target name
+                                      - target alias
+                                      - target type (staticlib, sharedlib, dynamicmodule, program, testprograms)
+                                    The most specific flag take will take precendence
+  hash-format=md5|sha1|sha256     : Content signature hash function (requires SCons 4.2 or above)    [md5]
+                                    md5 is the fastest: use decider=MD5-timestamp to skip unchanged files
+  hash-chunksize=<int>            : Block size in kilobytes used when hashing file contents          [SCons default]
   mscver=<float>                  : Visual C runtime version                                         [10.0] (windows)
   with-vcvars=<str>               : Specify Visual Studio variables setup script                            (windows)
   no-console=0|1                  : Use window subsystem                                             [0]    (windows)
   devtoolset=<str>                : SCL developer toolset version                                           (linux)
+  compiler-launcher=<str>         : Compiler launcher ('ccache', 'sccache' or path to executable)           (linux/mac)
+                                    Also used for cmake and automake projects
+  dist-workers=<str>              : Comma separated list of distributed compilation workers                 (linux/mac)
+                                    (<host>[:<port>], see 'distcompile.py')
+                                    Also read from EXCONS_DIST_WORKERS environment variable
+                                    Ignored with pgo=generate|use
+  dist-timeout=<float>            : Distributed compilation job timeout in seconds                   [300]  (linux/mac)
+  linker=bfd|gold|lld|mold        : Linker used for programs, shared libraries and modules                  (linux)
+  linker-threads=<int>            : Number of threads used by gold, lld or mold linkers (0: default) [0]    (linux)
   strip=0|1                       : Strip dead code                                                  [0]    (linux/mac)
   use-c++11=0|1                   : Compile code as C++ 11                                           [0]    (linux/mac)
   use-stdc++=0|1                  : Use libstdc++ for C++ 11                                         [0]    (mac)
@@ -1442,6 +2473,21 @@ def ExternalLibRequire(name, libnameFunc=None, definesFunc=None, extraEnvFunc=No
 
     return rv
 
+ConfigurationHashKeys = ["CC", "CXX", "CPPPATH", "CPPDEFINES", "CPPFLAGS", "CCFLAGS", "CFLAGS", "CXXFLAGS", "SHCCFLAGS", "SHCXXFLAGS"]
+
+def ConfigurationHash(env, keys=None):
+    if keys is None:
+        keys = ConfigurationHashKeys
+
+    h = hashlib.sha1()
+    for k in keys:
+        # Expanded values: flags may come from other variables (i.e. $LTO_CCFLAGS, $PGO_CCFLAGS)
+        #   CPPDEFINES is expanded to flags so that ('A', 1) and ['A', '1'] don't collide
+        val = env.subst("$_CPPDEFFLAGS" if k == "CPPDEFINES" else "$" + k)
+        h.update((u"%s=%s\n" % (k, val)).encode("UTF-8"))
+
+    return h.hexdigest()[:12]
+
 def _AddDeps(penv, settings, tgt, all_projs):
     for k in ("deps", "libs", "staticlibs"):
         if k in settings:
@@ -1493,6 +2539,7 @@ def DeclareTargets(env, prjs):
         prefix = settings.get("prefix", None)
         fullprefix = settings.get("fullprefix", None)
         progress_nodes = set()
+        dwos = []
 
         if not "type" in settings:
             print("[excons] Project \"%s\" missing \"type\"" % prj)
@@ -1586,6 +2633,36 @@ def DeclareTargets(env, prjs):
                 for customcall in settings["custom"]:
                     customcall(penv)
 
+            # Allow overriding of the decider from command line
+            #   using '<targetname>-decider=<decider>' or
+            #         '<targetalias>-decider=<decider>' or
+            #         '<targettype>-decider=<decider>' flag
+            flags = ["%s-decider" % prj]
+            if alias != prj:
+                flags.append("%s-decider" % alias)
+            flags.append("%s-decider" % settings["type"])
+            for flag in flags:
+                decider = GetArgument(flag, None)
+                if decider is not None:
+                    break
+            if decider is None:
+                decider = settings.get("decider", None)
+            if decider is not None:
+                SetupDecider(penv, decider)
+
+            if "LTO_CCFLAGS" in penv and settings.get("lto", True) in (False, 0, "off"):
+                # Per-target opt-out for code that doesn't survive link time optimization
+                penv["LTO_CCFLAGS"] = []
+                penv["LTO_LINKFLAGS"] = []
+
+            pgo = ("PGO_CCFLAGS" in penv and settings.get("pgo", True) not in (False, 0, "off"))
+            if "PGO_CCFLAGS" in penv and not pgo:
+                penv["PGO_CCFLAGS"] = []
+                penv["PGO_LINKFLAGS"] = []
+
+            if BOLTMode() != "off" and settings["type"] in ("program", "sharedlib") and "bolt_train" in settings:
+                SetupBOLT(penv)
+
             odir = joinpath(BuildBaseDirectory(), prj)
             if "bldprefix" in settings:
                 odir = joinpath(odir, settings["bldprefix"])
@@ -1619,31 +2696,64 @@ def DeclareTargets(env, prjs):
                     penv.Append(CCFLAGS=["-fvisibility=hidden"])
                     if settings.get("inlvis", "hidden") == "hidden":
                         penv.Append(CXXFLAGS=["-fvisibility-inlines-hidden"])
+                    if penv.get("LTO_LINKFLAGS"):
+                        # Code is generated at link time with LTO: symbols created there (clones,
+                        #   partitions) must get the same visibility so they can be internalized
+                        penv.Append(LTO_LINKFLAGS=["-fvisibility=hidden"])
+
+            if GetArgument("bld-config-hash", 0, int):
+                # Keep objects built against different external dependencies configurations apart
+                #   so that switching back to a previous configuration doesn't trigger a full rebuild
+                odir = joinpath(odir, ConfigurationHash(penv))
+
+            splitdi = (SplitDebugInfo() and "-g" in str(penv["CPPFLAGS"]).split())
+
+            isavariants = ISAVariants(settings)
+            isasrcs = set([str(x).replace("\\", "/") for x in settings.get("isa_srcs", [])])
+            if not isavariants and settings.get("isa_srcs", []):
+                # No dispatch: define functions at global scope
+                penv.Append(CPPDEFINES=[("EXCONS_ISA_BEGIN", ""), ("EXCONS_ISA_END", "")])
 
             objs = []
+            objsrcs = []
+            objexts = set([".o", ".os", penv["OBJSUFFIX"], penv["SHOBJSUFFIX"]])
             srcs = settings.get("srcs", [])
             # Source level dependencies
             srcdeps = settings.get("srcdeps", {})
             prereqs = srcdeps.get("*", [])
             srcdict = isinstance(srcs, dict)
-            for item in srcs:
+            reproducible = (GetArgument("reproducible", 0, int) != 0)
+            srckeys = srcs
+            if reproducible:
+                # Same objects order on link command line whatever the order sources were globbed in
+                srckeys = sorted(srcs, key=str)
+            for item in srckeys:
                 if not srcdict:
                     extradir = ""
                     srcitems = [item]
                 else:
                     extradir = item
-                    srcitems = srcs[item]
+                    srcitems = (srcs[item] if not reproducible else sorted(srcs[item], key=str))
                 for src in srcitems:
                     bn = os.path.basename(str(src))
                     bnnoext = os.path.splitext(bn)[0]
                     if extradir:
                         bnnoext = extradir + "/" + bnnoext
-                    if shared:
+                    if isavariants and (str(src).replace("\\", "/") in isasrcs or bn in isasrcs):
+                        # Compile once per ISA variant
+                        obj = _ISAObjects(penv, odir, bnnoext, src, isavariants, shared)
+                    elif shared:
                         obj = penv.SharedObject(joinpath(odir, bnnoext + ".os"), src)
                     else:
                         obj = penv.StaticObject(joinpath(odir, bnnoext + ".o"), src)
+                    # Only link object files: custom object builders emitters may declare other outputs
+                    obj = [x for x in obj if os.path.splitext(str(x))[1] in objexts]
                     #objs.append(obj)
                     objs.extend(obj)
+                    for o in obj:
+                        objsrcs.append((o, src))
+                    if splitdi:
+                        dwos.extend(_AddSplitDebugInfo(penv, obj))
                     key = str(src)
                     deps = srcdeps.get(key, [])
                     if not deps:
@@ -1658,8 +2768,26 @@ def DeclareTargets(env, prjs):
                     if prereqs:
                         penv.Depends(obj, prereqs)
 
+            if isavariants:
+                obj = _ISADispatcher(penv, odir, prj, settings, isavariants, shared)
+                objs.extend(obj)
+                if splitdi:
+                    dwos.extend(_AddSplitDebugInfo(penv, obj))
+
             progress_nodes = set([abspath(str(x)) for x in objs])
 
+            if pgo and PGOMode() == "use" and objsrcs:
+                # Rebuild objects when training regenerates their profile (like BOLT does with its profile)
+                for obj, _ in objsrcs:
+                    prof = _PGOProfileFile(penv, obj)
+                    if os.path.isfile(prof):
+                        penv.Depends(obj, prof)
+                missing, stale = _PGOProfileStatus(penv, [x[0] for x in objsrcs], [x[1] for x in objsrcs])
+                if missing:
+                    WarnOnce("%s: no profile data for %d of %d object(s)" % (prj, missing, len(objsrcs)), tool="pgo")
+                if stale:
+                    WarnOnce("%s: %d source(s) modified after profile data was generated" % (prj, stale), tool="pgo")
+
             if alias != prj:
                 if not alias in help_targets:
                     val = help_targets.get(alias, "")
@@ -2029,6 +3157,21 @@ def DeclareTargets(env, prjs):
             else:
                 pout = None
 
+        if pout and dwos and settings["type"] in ("program", "testprograms", "sharedlib", "dynamicmodule") and GetArgument("debug-info-package", 0, int):
+            pout.extend(_SplitDebugInfoPackages(penv, [x for x in pout if abspath(str(x)) in progress_nodes], dwos))
+
+        if pout and penv.get("PGO_CCFLAGS") and PGOMode() == "generate" and "pgo_train" in settings:
+            _AddTraining(penv, prj, [x for x in pout if abspath(str(x)) in progress_nodes], settings["pgo_train"])
+
+        if pout and penv.get("BOLT") and settings["type"] in ("program", "sharedlib"):
+            nodes = [x for x in pout if abspath(str(x)) in progress_nodes]
+            _AddBOLT(penv, prj, nodes)
+            if BOLTMode() == "instrument":
+                _AddTraining(penv, prj, nodes, settings["bolt_train"], name="bolt-train")
+
+        if pout and "OBJCOPY" in penv and settings["type"] in ("program", "testprograms", "sharedlib", "dynamicmodule"):
+            _AddSeparateDebugInfo(penv, [x for x in pout if abspath(str(x)) in progress_nodes])
+
         if pout or settings["type"] == "install":
             if pout and "post" in settings:
                 penv.AddPostAction(pout, settings["post"])
@@ -66,9 +66,23 @@ def Outputs(name):
         with io.open(cof, "r", newline="\n", encoding="UTF-8") as f:
             _lines = [l.strip() for l in f.readlines()]
             lines = [l for l in _lines if len(l) > 0 and os.path.isfile(os.path.join(cofd, l))]
-            lst = [excons.out_dir + "/" + x for x in lines if VC_Filter(x)]
+            lst = sorted([excons.out_dir + "/" + x for x in lines if VC_Filter(x)])
     return lst
 
+def _CommandEnv():
+    # Environment for configure and make: devtoolset and compiler launcher settings (None for current one)
+    env = None
+    if sys.platform != "win32":
+        _env = excons.devtoolset.GetDevtoolsetEnv(excons.GetArgument("devtoolset", ""), merge=True)
+        if _env:
+            env = os.environ.copy()
+            env.update(_env)
+        if excons.CompilerLauncher():
+            if env is None:
+                env = os.environ.copy()
+            env.update(excons.CompilerLauncherEnv())
+    return env
+
 def Configure(name, topdir=None, opts=None):
     if SCons.Script.GetOption("clean"):
         return True
@@ -82,6 +96,20 @@ def Configure(name, topdir=None, opts=None):
     bld = BuildDir(name)
     relpath = os.path.relpath(topdir, bld)
 
+    env = _CommandEnv()
+
+    launcher = excons.CompilerLauncher()
+    if launcher:
+        # Resolve compilers in the same environment as configure (i.e. devtoolset's gcc)
+        runenv = (os.environ if env is None else env)
+        opts = opts.copy()
+        for k, cc in (("CC", "gcc"), ("CXX", "g++")):
+            if not k in opts:
+                cc = runenv.get(k, cc)
+                if not os.path.isabs(cc):
+                    cc = excons._FindInPath(cc, runenv.get("PATH", "")) or cc # pylint: disable=protected-access
+                opts[k] = "%s %s" % (launcher, cc)
+
     cmd = "cd \"%s\"; %s/configure " % (bld, relpath)
     for k, v in excons.iteritems(opts):
         if type(v) == bool:
@@ -91,13 +119,6 @@ def Configure(name, topdir=None, opts=None):
             cmd += "%s=%s " % (k, ("\"%s\"" % v if isinstance(v, excons.anystring) else v))
     cmd += "--prefix=\"%s\""  % excons.OutputBaseDirectory()
 
-    env = None
-    if sys.platform != "win32":
-        _env = excons.devtoolset.GetDevtoolsetEnv(excons.GetArgument("devtoolset", ""), merge=True)
-        if _env:
-            env = os.environ.copy()
-            env.update(_env)
-
     excons.Print("Run Command: %s" % cmd, tool="automake")
     p = subprocess.Popen(cmd, env=env, shell=True)
     p.communicate()
@@ -157,12 +178,7 @@ def Build(name, target=None):
         cmd += " V=1"
     cmd += " %s" % target
 
-    env = None
-    if sys.platform != "win32":
-        _env = excons.devtoolset.GetDevtoolsetEnv(excons.GetArgument("devtoolset", ""), merge=True)
-        if _env:
-            env = os.environ.copy()
-            env.update(_env)
+    env = _CommandEnv()
 
     excons.Print("Run Command: %s" % cmd, tool="automake")
     p = subprocess.Popen(cmd, shell=True, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
@@ -0,0 +1,207 @@
+# MIT License
+#
+# Copyright (c) 2009 Gaetan Guidet
+#
+# This file is part of excons.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import re
+import atexit
+import threading
+import excons
+import SCons.CacheDir # pylint: disable=import-error
+import SCons.Script # pylint: disable=import-error
+
+# pylint: disable=bare-except
+
+
+_Stats = {}
+_StatsLock = threading.Lock()
+_Setup = False
+
+def ParseSize(s):
+    if not s:
+        return None
+
+    m = re.match(r"^(\d+(?:\.\d+)?)([kmgt])?b?$", str(s).strip().lower())
+    if m is None:
+        return None
+
+    sz = float(m.group(1))
+    if m.group(2):
+        sz *= 1024 ** ("kmgt".index(m.group(2)) + 1)
+    return int(sz)
+
+def FormatSize(sz):
+    for unit in ("B", "KB", "MB", "GB"):
+        if sz < 1024:
+            return "%.1f%s" % (sz, unit)
+        sz /= 1024.0
+    return "%.1fTB" % sz
+
+def ToolchainKey():
+    # Build mode, platform, architecture and compiler version
+    return os.path.relpath(excons.BuildBaseDirectory(), excons.bld_dir).replace("\\", "/")
+
+def GetPath():
+    path = excons.GetArgument("cache-dir", None)
+    if not path:
+        if not excons.GetArgument("remote-cache", None):
+            return None
+        # Remote cache requires a local cache directory
+        path = excons.joinpath(excons.bld_dir, "cache")
+    return excons.joinpath(excons.abspath(os.path.expanduser(path)), ToolchainKey())
+
+def _TargetName(node):
+    path = excons.abspath(str(node))
+    for name, nodes, _ in excons.all_progress:
+        if path in nodes:
+            return name
+    return None
+
+def _Record(node, hit):
+    name = _TargetName(node)
+    if name is None:
+        return
+
+    size = 0
+    if hit:
+        try:
+            size = os.path.getsize(str(node))
+        except:
+            pass
+
+    with _StatsLock:
+        hits, misses, saved = _Stats.get(name, (0, 0, 0))
+        if hit:
+            _Stats[name] = (hits + 1, misses, saved + size)
+        else:
+            _Stats[name] = (hits, misses + 1, saved)
+
+class ManagedCacheDir(SCons.CacheDir.CacheDir):
+    def retrieve(self, node):
+        rv = super(ManagedCacheDir, self).retrieve(node)
+        if self.is_enabled():
+            _Record(node, rv)
+        return rv
+
+def Prune(path, maxsize, verbose=True):
+    if not path or not os.path.isdir(path) or maxsize is None:
+        return 0
+
+    entries = []
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            # Keep SCons' cache configuration file
+            if dirpath == path and filename == "config":
+                continue
+            filepath = os.path.join(dirpath, filename)
+            try:
+                st = os.lstat(filepath)
+            except:
+                continue
+            # SCons updates the modification time of retrieved files: oldest ones are the least recently used
+            entries.append((st.st_mtime, st.st_size, filepath))
+            total += st.st_size
+
+    if total <= maxsize:
+        return 0
+
+    entries.sort()
+    removed = 0
+    for _, size, filepath in entries:
+        if total <= maxsize:
+            break
+        try:
+            os.remove(filepath)
+            total -= size
+            removed += size
+        except:
+            pass
+
+    if verbose:
+        excons.Print("Pruned %s from %s (%s remaining)" % (FormatSize(removed), path, FormatSize(total)), tool="cache")
+
+    return removed
+
+def PrintStats():
+    if not _Stats:
+        return
+
+    allhits, allmisses, allsaved = 0, 0, 0
+    for name in sorted(_Stats.keys()):
+        hits, misses, saved = _Stats[name]
+        excons.Print("%s: %d hit(s), %d miss(es), %s retrieved" % (name, hits, misses, FormatSize(saved)), tool="cache")
+        allhits += hits
+        allmisses += misses
+        allsaved += saved
+    excons.Print("Total: %d hit(s), %d miss(es), %s retrieved" % (allhits, allmisses, FormatSize(allsaved)), tool="cache")
+
+def Setup(env):
+    global _Setup
+
+    path = GetPath()
+    if not path:
+        return None
+
+    # SCons only creates the last level of the cache directory
+    parent = os.path.dirname(path)
+    if not os.path.isdir(parent):
+        try:
+            os.makedirs(parent)
+        except:
+            excons.WarnOnce("Could not create cache directory '%s'" % parent, tool="cache")
+            return None
+
+    cls = ManagedCacheDir
+    remote = excons.GetArgument("remote-cache", None)
+    if remote:
+        from excons import remotecache
+        cls = remotecache.Setup(remote, ToolchainKey()) or ManagedCacheDir
+
+    try:
+        env.CacheDir(path, cls)
+    except TypeError:
+        # SCons prior to 4.2 doesn't support custom CacheDir classes
+        env.CacheDir(path)
+
+    maxsize = ParseSize(excons.GetArgument("cache-size", None))
+
+    if not _Setup:
+        _Setup = True
+
+        if "cache-prune" in SCons.Script.COMMAND_LINE_TARGETS:
+            def _PruneAction(target, source, env): # pylint: disable=unused-argument
+                if maxsize is None:
+                    excons.WarnOnce("No cache size limit set (use cache-size= flag).", tool="cache")
+                else:
+                    Prune(path, maxsize)
+                return None
+            SCons.Script.AlwaysBuild(SCons.Script.Alias("cache-prune", [], SCons.Script.Action(_PruneAction, "Pruning cache ...")))
+
+        elif not SCons.Script.GetOption("clean") and not SCons.Script.GetOption("help"):
+            atexit.register(PrintStats)
+            if maxsize is not None:
+                atexit.register(Prune, path, maxsize)
+
+    return path
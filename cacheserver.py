@@ -0,0 +1,140 @@
+# MIT License
+#
+# Copyright (c) 2009 Gaetan Guidet
+#
+# This file is part of excons.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Reference content-addressed cache server for excons 'remote-cache=' flag
+#
+# Usage: python cacheserver.py [--host <str>] [--port <int>] [--root <path>]
+#
+#   GET /<key> : Return cached object or 404
+#   PUT /<key> : Store object
+#
+# Object permissions are passed in octal in the X-Excons-Mode header of both requests.
+#
+# This module doesn't depend on SCons nor excons so that it can run standalone.
+
+
+import os
+import re
+import sys
+import argparse
+import tempfile
+
+if sys.version_info[0] > 2:
+    import http.server as httpserver
+    import socketserver
+else:
+    import BaseHTTPServer as httpserver # pylint: disable=import-error
+    import SocketServer as socketserver # pylint: disable=import-error
+
+
+KeyExp = re.compile(r"^[A-Za-z0-9_.+-]+(/[A-Za-z0-9_.+-]+)*$")
+
+# Object file permissions, only the executable bit is kept (see remotecache.FileMode)
+ModeHeader = "X-Excons-Mode"
+
+class CacheRequestHandler(httpserver.BaseHTTPRequestHandler):
+    root = "."
+    quiet = False
+
+    def _path(self):
+        key = self.path.lstrip("/")
+        if not KeyExp.match(key) or ".." in key.split("/"):
+            self.send_error(400, "Invalid key")
+            return None
+        return os.path.join(self.root, key)
+
+    def do_GET(self): # pylint: disable=invalid-name
+        path = self._path()
+        if path is None:
+            return
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        with open(path, "rb") as f:
+            data = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header(ModeHeader, "%o" % (os.stat(path).st_mode & 0o777))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_PUT(self): # pylint: disable=invalid-name
+        path = self._path()
+        if path is None:
+            return
+        size = int(self.headers.get("Content-Length", "0"))
+        data = self.rfile.read(size)
+        try:
+            mode = int(self.headers.get(ModeHeader, "644"), 8)
+        except ValueError:
+            self.send_error(400, "Invalid mode")
+            return
+        dn = os.path.dirname(path)
+        if not os.path.isdir(dn):
+            try:
+                os.makedirs(dn)
+            except OSError:
+                # Concurrent creation
+                pass
+        # Write then rename so that readers never see partial objects
+        fd, tmp = tempfile.mkstemp(dir=dn)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # mkstemp creates files only readable by the server user
+        os.chmod(tmp, (0o755 if mode & 0o111 else 0o644))
+        os.rename(tmp, path)
+        self.send_response(201)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args): # pylint: disable=redefined-builtin
+        if not self.quiet:
+            httpserver.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+class CacheServer(socketserver.ThreadingMixIn, httpserver.HTTPServer):
+    daemon_threads = True
+
+def Serve(host="127.0.0.1", port=8080, root=".", quiet=False):
+    handler = type("Handler", (CacheRequestHandler,), {"root": os.path.abspath(root), "quiet": quiet})
+    server = CacheServer((host, port), handler)
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="excons reference remote cache server")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--root", default=".", help="Storage directory")
+    parser.add_argument("--quiet", action="store_true", help="Don't log requests")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        os.makedirs(args.root)
+
+    srv = Serve(args.host, args.port, args.root, args.quiet)
+    print("Serving %s on %s:%d" % (os.path.abspath(args.root), args.host, args.port))
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,220 @@
+# MIT License
+#
+# Copyright (c) 2009 Gaetan Guidet
+#
+# This file is part of excons.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+# Configure checks: compile (and link) small test programs with a target environment
+#
+#   from excons import checks
+#   if checks.Flag(env, "-mavx2"): ...
+#   hasz, hasdl = checks.Run(env, [("lib", "z"), ("header", "dlfcn.h")])
+#
+# Checks run in parallel and their results are stored in the probe cache (see probecache.py),
+#   keyed by compiler identity, flags and test program, much like autoconf's config.cache.
+
+
+import os
+import shutil
+import hashlib
+import excons
+from excons import probecache
+import SCons.Util # pylint: disable=import-error
+
+# pylint: disable=bare-except
+
+
+_Results = {}
+
+def _Includes(headers):
+    if not headers:
+        return ""
+    if isinstance(headers, excons.anystring):
+        headers = [headers]
+    return "".join(["#include <%s>\n" % x for x in headers])
+
+# Build stage flags that don't change check results but may add warnings to test programs
+#   (i.e. -Wmissing-profile with pgo=use), turned into errors by flag checks
+_IgnoredFlagPrefixes = ("-g", "-fprofile-", "-flto", "-fuse-linker-plugin", "-Wmissing-profile",
+                        "-Wl,--emit-relocs", "-Wl,--gdb-index", "-Wl,--build-id")
+
+def _Sanitize(penv):
+    for k in ("PGO_CCFLAGS", "PGO_LINKFLAGS", "LTO_CCFLAGS", "LTO_LINKFLAGS"):
+        if k in penv:
+            penv[k] = []
+    for k in ("CPPFLAGS", "CCFLAGS", "CFLAGS", "CXXFLAGS", "LINKFLAGS"):
+        if k in penv:
+            flags = SCons.Util.CLVar(penv.subst("$" + k))
+            penv[k] = SCons.Util.CLVar([x for x in flags if not x.startswith(_IgnoredFlagPrefixes)])
+
+def _Prepare(env, check):
+    # check: (kind, arg[, options dict])
+    kind, arg = check[0], check[1]
+    opts = (check[2] if len(check) > 2 else {})
+    lang = opts.get("lang", "c++")
+    link = opts.get("link", False)
+    msvc = ("msvc" in env["TOOLS"])
+
+    penv = env.Clone()
+    # Test programs don't need to go through ccache or remote workers
+    penv["COMPILER_LAUNCHER"] = ""
+    penv["DIST_COMPILE"] = ""
+    _Sanitize(penv)
+
+    if kind == "flag":
+        # Warnings about unused or unknown flags must fail the check
+        src = "int main() { return 0; }\n"
+        if link:
+            penv.Append(LINKFLAGS=[arg])
+        else:
+            penv.Append(CCFLAGS=[arg])
+        penv.Append(CCFLAGS=["/WX" if msvc else "-Werror"])
+
+    elif kind == "header":
+        src = _Includes(arg) + "int main() { return 0; }\n"
+
+    elif kind == "symbol":
+        # Declaration (function, variable or macro) available from given headers
+        src = _Includes(opts.get("headers", None)) + "int main() {\n#ifndef %s\n  (void)%s;\n#endif\n  return 0;\n}\n" % (arg, arg)
+
+    elif kind == "lib":
+        link = True
+        penv.Append(LIBS=[arg])
+        symbol = opts.get("symbol", None)
+        if symbol:
+            # Don't rely on headers: declare the symbol the way autoconf does
+            decl = ("extern \"C\" " if lang == "c++" else "") + "char %s();\n" % symbol
+            src = decl + "int main() { return (int)%s(); }\n" % symbol
+        else:
+            src = "int main() { return 0; }\n"
+
+    elif kind == "source":
+        src = arg
+
+    else:
+        excons.WarnOnce("Invalid check kind '%s'" % kind, tool="checks")
+        return None
+
+    cvar = ("CXX" if lang == "c++" else "CC")
+    compiler = penv.subst("$" + cvar)
+    path = (compiler if os.path.isabs(compiler) else excons._FindInPath(compiler, penv["ENV"].get("PATH", os.environ.get("PATH", "")))) # pylint: disable=protected-access
+    compilerkey = probecache.FileKey(path) if path else compiler
+
+    # Deterministic location so that command lines can be part of the key
+    h = hashlib.sha1()
+    for item in (kind, str(arg), lang, str(link), src, penv.subst("$%sCOM" % cvar), penv.subst("$LINKFLAGS $_LIBDIRFLAGS $_LIBFLAGS")):
+        h.update(item.encode("UTF-8"))
+    tmpdir = excons.joinpath(probecache.Directory(), "tmp", h.hexdigest()[:16])
+
+    srcpath = excons.joinpath(tmpdir, "check" + (".cpp" if lang == "c++" else ".c"))
+    objpath = excons.joinpath(tmpdir, "check" + penv["OBJSUFFIX"])
+    exepath = excons.joinpath(tmpdir, "check" + penv["PROGSUFFIX"])
+
+    cmd = penv.subst("$%sCOM" % cvar, target=[penv.File(objpath)], source=[penv.File(srcpath)])
+    if link:
+        linkcom = penv["LINKCOM"]
+        if isinstance(linkcom, (list, tuple)):
+            # Drop manifest embedding steps
+            linkcom = linkcom[0]
+        cmd += " && " + penv.subst(linkcom, target=[penv.File(exepath)], source=[penv.File(objpath)])
+
+    return {"key": "%s|%s" % (compilerkey, h.hexdigest()),
+            "desc": "%s '%s'" % (kind, (arg if kind != "source" else h.hexdigest()[:8])),
+            "dir": tmpdir,
+            "src": srcpath,
+            "code": src,
+            "cmd": cmd,
+            "env": dict([(k, str(v)) for k, v in penv["ENV"].items()])}
+
+def Run(env, checks):
+    # Return a list of booleans in the same order as checks
+    #   check: (kind, arg[, options]) where kind is one of
+    #     'flag'   : compiler flag (options: 'link' to check a linker flag)
+    #     'header' : header name or list of headers
+    #     'symbol' : declaration (options: 'headers')
+    #     'lib'    : library name (options: 'symbol' to check for a function)
+    #     'source' : test program source code (options: 'link')
+    #   common options: 'lang' ('c' or 'c++', default 'c++')
+    rv = [None] * len(checks)
+    todo = []
+
+    for i, check in enumerate(checks):
+        spec = _Prepare(env, check)
+        if spec is None:
+            rv[i] = False
+            continue
+        res = _Results.get(spec["key"], None)
+        if res is None:
+            res = probecache.Get("checks", spec["key"])
+        if res is not None:
+            _Results[spec["key"]] = res
+            rv[i] = res
+        else:
+            todo.append((i, spec))
+
+    # Commands environments only differ in rare cases (i.e. different devtoolsets per target)
+    groups = {}
+    for i, spec in todo:
+        groups.setdefault(repr(sorted(spec["env"].items())), []).append((i, spec))
+
+    for items in groups.values():
+        for _, spec in items:
+            if not os.path.isdir(spec["dir"]):
+                os.makedirs(spec["dir"])
+            with open(spec["src"], "w") as f:
+                f.write(spec["code"])
+        outs = probecache.Spawn([x[1]["cmd"] for x in items], env=items[0][1]["env"])
+        for (i, spec), (rc, _) in zip(items, outs):
+            res = (rc == 0)
+            excons.PrintOnce("Checking for %s... %s" % (spec["desc"], ("yes" if res else "no")), tool="checks")
+            _Results[spec["key"]] = res
+            probecache.Set("checks", spec["key"], res)
+            rv[i] = res
+            try:
+                shutil.rmtree(spec["dir"])
+            except:
+                pass
+
+    if todo:
+        try:
+            os.rmdir(os.path.dirname(todo[0][1]["dir"]))
+        except:
+            # Still in use by a concurrent build
+            pass
+
+    return rv
+
+def Flag(env, flag, link=False, lang="c++"):
+    return Run(env, [("flag", flag, {"link": link, "lang": lang})])[0]
+
+def Header(env, header, lang="c++"):
+    return Run(env, [("header", header, {"lang": lang})])[0]
+
+def Symbol(env, symbol, headers=None, lang="c++"):
+    return Run(env, [("symbol", symbol, {"headers": headers, "lang": lang})])[0]
+
+def Lib(env, lib, symbol=None, lang="c"):
+    return Run(env, [("lib", lib, {"symbol": symbol, "lang": lang})])[0]
+
+def Source(env, code, link=False, lang="c++"):
+    return Run(env, [("source", code, {"link": link, "lang": lang})])[0]
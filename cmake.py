@@ -82,7 +82,7 @@ def Outputs(name):
         with io.open(cof, "r", newline="\n", encoding="UTF-8") as f:
             _lines = [x.strip() for x in f.readlines()]
             lines = [x for x in _lines if len(x) > 0 and os.path.isfile(os.path.join(cofd, x))]
-            lst = [excons.out_dir + "/" + x for x in lines if VC_Filter(x)]
+            lst = sorted([excons.out_dir + "/" + x for x in lines if VC_Filter(x)])
     return lst
 
 def Configure(name, topdir=None, opts=None, min_mscver=None, flags=None):
@@ -131,6 +131,12 @@ def Configure(name, topdir=None, opts=None, min_mscver=None, flags=None):
         if _env:
             env = os.environ.copy()
             env.update(_env)
+        launcher = excons.CompilerLauncher()
+        if launcher:
+            for lang in ("C", "CXX"):
+                k = "CMAKE_%s_COMPILER_LAUNCHER" % lang
+                if not k in opts:
+                    cmd += "-D%s=\"%s\" " % (k, launcher)
     if flags:
         if not cmd.endswith(" "):
             cmd += " "
@@ -207,6 +213,10 @@ def Build(name, config=None, target=None):
         if _env:
             env = os.environ.copy()
             env.update(_env)
+        if excons.CompilerLauncher():
+            if env is None:
+                env = os.environ.copy()
+            env.update(excons.CompilerLauncherEnv())
 
     excons.Print("Run Command: %s" % cmd, tool="cmake")
     p = subprocess.Popen(cmd, shell=True, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True) if sys.version_info.major > 2 else subprocess.Popen(cmd, shell=True, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
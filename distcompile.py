@@ -0,0 +1,381 @@
+# MIT License
+#
+# Copyright (c) 2009 Gaetan Guidet
+#
+# This file is part of excons.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Distributed compilation for excons 'dist-workers=' flag
+#
+# Worker daemon:
+#   python distcompile.py worker [--host <str>] [--port <int>] [--jobs <int>] [--compilers <regex>]
+#
+# Compiler wrapper (setup by excons as compiler command prefix):
+#   python distcompile.py compile <compiler> <arguments>...
+#
+# Source files are preprocessed locally, the preprocessed output is sent to the
+# first available worker that compiles it and sends back the object file.
+# Compilation falls back to the local machine when no worker can handle the job.
+#
+# Protocol: each message is a JSON header line followed by 'size' bytes of payload.
+#   request  : {"compiler", "version", "args", "source", "cwd", "size"} + preprocessed source
+#   response : {"status": "ok"|"busy"|"error", "returncode", "stderr", "size"} + object file
+#
+# Workers run compilers on behalf of clients: only run them on trusted networks.
+#
+# This module doesn't depend on SCons nor excons so that it can run standalone.
+
+
+import os
+import re
+import sys
+import json
+import random
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+
+if sys.version_info[0] > 2:
+    import socketserver
+else:
+    import SocketServer as socketserver # pylint: disable=import-error
+
+# pylint: disable=bare-except, broad-except
+
+
+DefaultPort = 3633
+DefaultCompilers = r"^(gcc|g\+\+|cc|c\+\+|clang|clang\+\+)(-[0-9.]+)?$"
+
+SourceExts = {".c": "c",
+              ".i": "c",
+              ".cc": "c++",
+              ".cp": "c++",
+              ".cpp": "c++",
+              ".cxx": "c++",
+              ".c++": "c++",
+              ".C": "c++",
+              ".ii": "c++"}
+
+# Preprocessor only flags: not sent to workers (flags with separate value first)
+PreprocessorFlags = ["-include", "-imacros", "-isystem", "-iquote", "-idirafter", "-iprefix", "-iwithprefix", "-isysroot", "-I", "-D", "-U"]
+PreprocessorSwitches = ["-nostdinc", "-nostdinc++", "-undef"]
+
+# Flags that cannot be handled remotely (local dependency files, extra outputs...)
+LocalOnlyFlags = re.compile(r"^(-M.*|-E|-S|-fsyntax-only|-save-temps.*|-gsplit-dwarf|-fprofile-(generate|use|instr-generate|instr-use|sample-use).*|-fauto-profile.*|-flto.*|-fdump-.*|-fcoverage-.*|--coverage|-ftest-coverage|@.*)$")
+
+# Flags a worker refuses as they may run arbitrary code or read arbitrary files
+UnsafeFlags = re.compile(r"^(-fplugin.*|-wrapper|-specs.*|--specs.*|-B.*|-o.*|-x|@.*|-fprofile-.*|-iplugindir.*|-Xclang|-load|-Wl,.*|-Xlinker|-Xassembler|-Wa,.*|-Xpreprocessor|-Wp,.*)$")
+
+
+def Log(msg):
+    if os.environ.get("EXCONS_DIST_VERBOSE", "0") not in ("", "0"):
+        sys.stderr.write("[distcompile] %s\n" % msg)
+
+def SendMessage(f, header, data=b""):
+    header = dict(header)
+    header["size"] = len(data)
+    f.write((json.dumps(header) + "\n").encode("UTF-8"))
+    if data:
+        f.write(data)
+    f.flush()
+
+def ReadMessage(f):
+    line = f.readline()
+    if not line:
+        raise EOFError("Connection closed")
+    header = json.loads(line.decode("UTF-8"))
+    size = int(header.get("size", 0))
+    data = f.read(size) if size > 0 else b""
+    if len(data) != size:
+        raise EOFError("Truncated message")
+    return header, data
+
+
+# Client
+
+class Job(object):
+    def __init__(self, compiler, args):
+        self.compiler = compiler
+        self.args = args
+        self.source = None
+        self.output = None
+        self.lang = None
+        self.remote_args = []
+        self.cpp_args = []
+
+    def parse(self):
+        # Returns False if the command is not a single source compilation that can be distributed
+        compile_only = False
+        i = 0
+        n = len(self.args)
+        while i < n:
+            arg = self.args[i]
+            if arg == "-c":
+                compile_only = True
+            elif arg == "-o":
+                if i + 1 >= n:
+                    return False
+                self.output = self.args[i+1]
+                i += 1
+            elif arg.startswith("-o"):
+                self.output = arg[2:]
+            elif arg == "-x":
+                # Explicit language not supported
+                return False
+            elif LocalOnlyFlags.match(arg):
+                return False
+            elif arg in PreprocessorSwitches:
+                self.cpp_args.append(arg)
+            elif arg in PreprocessorFlags:
+                if i + 1 >= n:
+                    return False
+                self.cpp_args.extend([arg, self.args[i+1]])
+                i += 1
+            elif [x for x in PreprocessorFlags if arg.startswith(x)]:
+                self.cpp_args.append(arg)
+            elif not arg.startswith("-"):
+                if self.source is not None:
+                    return False
+                self.source = arg
+            else:
+                self.cpp_args.append(arg)
+                self.remote_args.append(arg)
+            i += 1
+
+        if not compile_only or self.source is None or self.output is None:
+            return False
+
+        self.lang = SourceExts.get(os.path.splitext(self.source)[1], None)
+        return (self.lang is not None)
+
+    def mapped_cwd(self):
+        # Apply prefix maps to working directory so that remote debug info matches local builds
+        cwd = os.getcwd()
+        for arg in reversed(self.args):
+            for flag in ("-fdebug-prefix-map=", "-ffile-prefix-map="):
+                if arg.startswith(flag) and "=" in arg[len(flag):]:
+                    old, new = arg[len(flag):].split("=", 1)
+                    if cwd == old or cwd.startswith(old.rstrip("/") + "/"):
+                        return new + cwd[len(old):]
+        return cwd
+
+    def preprocess(self):
+        ext = os.path.splitext(self.source)[1]
+        if ext in (".i", ".ii"):
+            with open(self.source, "rb") as f:
+                return 0, f.read()
+        p = subprocess.Popen([self.compiler] + self.cpp_args + ["-E", self.source], stdout=subprocess.PIPE)
+        out, _ = p.communicate()
+        return p.returncode, out
+
+    def compile_remote(self, workers, version, timeout):
+        rv, data = self.preprocess()
+        if rv != 0:
+            # Preprocessing errors were already reported
+            return rv
+
+        base = os.path.splitext(os.path.basename(self.source))[0]
+        header = {"compiler": os.path.basename(self.compiler),
+                  "version": version,
+                  "args": self.remote_args,
+                  "lang": self.lang,
+                  "source": base + (".i" if self.lang == "c" else ".ii"),
+                  "cwd": self.mapped_cwd()}
+
+        workers = list(workers)
+        random.shuffle(workers)
+
+        for host, port in workers:
+            try:
+                sock = socket.create_connection((host, port), timeout=min(timeout, 2.0))
+            except Exception as e:
+                Log("%s:%d unreachable (%s)" % (host, port, e))
+                continue
+            try:
+                sock.settimeout(timeout)
+                f = sock.makefile("rwb")
+                SendMessage(f, header, data)
+                rsp, obj = ReadMessage(f)
+            except Exception as e:
+                Log("%s:%d failed (%s)" % (host, port, e))
+                continue
+            finally:
+                sock.close()
+
+            status = rsp.get("status", "error")
+            if status == "busy":
+                Log("%s:%d busy" % (host, port))
+                continue
+            elif status != "ok":
+                Log("%s:%d error (%s)" % (host, port, rsp.get("stderr", "")))
+                continue
+
+            if rsp.get("stderr", ""):
+                sys.stderr.write(rsp["stderr"])
+            rv = int(rsp.get("returncode", 1))
+            if rv == 0:
+                outdir = os.path.dirname(os.path.abspath(self.output))
+                fd, tmp = tempfile.mkstemp(dir=outdir)
+                with os.fdopen(fd, "wb") as of:
+                    of.write(obj)
+                if os.path.exists(self.output):
+                    os.remove(self.output)
+                os.rename(tmp, self.output)
+            Log("%s compiled on %s:%d" % (self.source, host, port))
+            return rv
+
+        return None
+
+    def compile_local(self):
+        Log("%s compiled locally" % self.source)
+        return subprocess.call([self.compiler] + self.args)
+
+def ParseWorkers(s):
+    workers = []
+    for item in re.split(r"[,;\s]+", s or ""):
+        if not item:
+            continue
+        if ":" in item:
+            host, port = item.rsplit(":", 1)
+            workers.append((host, int(port)))
+        else:
+            workers.append((item, DefaultPort))
+    return workers
+
+def Compile(compiler, args):
+    workers = ParseWorkers(os.environ.get("EXCONS_DIST_WORKERS", ""))
+    job = Job(compiler, args)
+    if workers and job.parse():
+        timeout = float(os.environ.get("EXCONS_DIST_TIMEOUT", "300"))
+        rv = job.compile_remote(workers, os.environ.get("EXCONS_DIST_VERSION", ""), timeout)
+        if rv is not None:
+            return rv
+    return job.compile_local()
+
+
+# Worker
+
+class WorkerRequestHandler(socketserver.StreamRequestHandler):
+    slots = None
+    compilers = None
+    versions = {}
+    quiet = False
+
+    def version(self, compiler):
+        if compiler not in self.versions:
+            try:
+                out = subprocess.check_output([compiler, "-dumpfullversion", "-dumpversion"], stderr=subprocess.STDOUT)
+                self.versions[compiler] = out.decode("UTF-8").strip()
+            except:
+                self.versions[compiler] = None
+        return self.versions[compiler]
+
+    def handle(self):
+        try:
+            header, data = ReadMessage(self.rfile)
+        except Exception:
+            return
+
+        compiler = header.get("compiler", "")
+        args = header.get("args", [])
+        if not self.compilers.match(compiler) or [x for x in args if UnsafeFlags.match(x)]:
+            SendMessage(self.wfile, {"status": "error", "stderr": "Rejected command"})
+            return
+
+        version = self.version(compiler)
+        if version is None or (header.get("version", "") and not version.startswith(header["version"])):
+            SendMessage(self.wfile, {"status": "error", "stderr": "%s version mismatch (%s)" % (compiler, version)})
+            return
+
+        if not self.slots.acquire(False):
+            SendMessage(self.wfile, {"status": "busy"})
+            return
+
+        tmpdir = tempfile.mkdtemp(prefix="excons_dist_")
+        try:
+            source = os.path.basename(header.get("source", "source.ii"))
+            with open(os.path.join(tmpdir, source), "wb") as f:
+                f.write(data)
+            lang = ("cpp-output" if header.get("lang", "c++") == "c" else "c++-cpp-output")
+            # Line markers keep client paths, only the working directory needs remapping
+            cmd = [compiler] + args + ["-fdebug-prefix-map=%s=%s" % (tmpdir, header.get("cwd", "."))]
+            cmd += ["-x", lang, "-c", source, "-o", "output.o"]
+            p = subprocess.Popen(cmd, cwd=tmpdir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            out, _ = p.communicate()
+            obj = b""
+            if p.returncode == 0:
+                with open(os.path.join(tmpdir, "output.o"), "rb") as f:
+                    obj = f.read()
+            if not self.quiet:
+                sys.stdout.write("%s %s -> %d\n" % (self.client_address[0], source, p.returncode))
+                sys.stdout.flush()
+            SendMessage(self.wfile, {"status": "ok", "returncode": p.returncode, "stderr": out.decode("UTF-8", "replace")}, obj)
+        except Exception as e:
+            try:
+                SendMessage(self.wfile, {"status": "error", "stderr": str(e)})
+            except:
+                pass
+        finally:
+            self.slots.release()
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+class WorkerServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def CPUCount():
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except:
+        return 1
+
+def Serve(host="127.0.0.1", port=DefaultPort, jobs=None, compilers=DefaultCompilers, quiet=False):
+    attrs = {"slots": threading.Semaphore(jobs or CPUCount()),
+             "compilers": re.compile(compilers),
+             "versions": {},
+             "quiet": quiet}
+    handler = type("Handler", (WorkerRequestHandler,), attrs)
+    return WorkerServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "compile":
+        sys.exit(Compile(sys.argv[2], sys.argv[3:]))
+
+    parser = argparse.ArgumentParser(description="excons distributed compilation worker")
+    parser.add_argument("mode", choices=["worker"], help="Run mode")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (use 0.0.0.0 to accept remote jobs)")
+    parser.add_argument("--port", type=int, default=DefaultPort, help="Port to listen on")
+    parser.add_argument("--jobs", type=int, default=0, help="Maximum number of concurrent compilations (defaults to CPU count)")
+    parser.add_argument("--compilers", default=DefaultCompilers, help="Allowed compilers regular expression")
+    parser.add_argument("--quiet", action="store_true", help="Don't log jobs")
+    args = parser.parse_args()
+
+    srv = Serve(args.host, args.port, args.jobs, args.compilers, args.quiet)
+    print("Worker listening on %s:%d (%d job(s))" % (args.host, args.port, args.jobs or CPUCount()))
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
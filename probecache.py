@@ -0,0 +1,137 @@
+# MIT License
+#
+# Copyright (c) 2009 Gaetan Guidet
+#
+# This file is part of excons.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+# Persistent memoization of environment probes (tool configuration commands, header scans...)
+#
+# Results are stored per category in '<bld-dir>/probes/<category>.json' and must be JSON
+#   serializable. Keys should include whatever invalidates the result, see FileKey.
+# Use 'probe-cache=0' to ignore (and overwrite) stored results.
+
+
+import os
+import io
+import sys
+import json
+import atexit
+import tempfile
+import threading
+import subprocess
+import excons
+
+# pylint: disable=bare-except
+
+
+_Caches = {}
+_Dirty = set()
+_Lock = threading.Lock()
+
+def Enabled():
+    return (excons.GetArgument("probe-cache", 1, int) != 0)
+
+def Directory():
+    if excons.bld_dir is None:
+        excons.InitGlobals()
+    return excons.joinpath(excons.bld_dir, "probes")
+
+def FileKey(path):
+    # Path, modification time and size: changes when a file is updated or replaced
+    try:
+        st = os.stat(path)
+    except:
+        return None
+    return "%s:%d:%d" % (excons.abspath(path), int(st.st_mtime * 1000000), st.st_size)
+
+def _Load(category):
+    cache = _Caches.get(category, None)
+    if cache is None:
+        cache = {}
+        if Enabled():
+            path = excons.joinpath(Directory(), category + ".json")
+            if os.path.isfile(path):
+                try:
+                    with io.open(path, "r", encoding="UTF-8") as f:
+                        cache = json.load(f)
+                except:
+                    excons.WarnOnce("Ignore invalid probe cache '%s'" % path)
+                    cache = {}
+        _Caches[category] = cache
+    return cache
+
+def Get(category, key, default=None):
+    with _Lock:
+        return _Load(category).get(key, default)
+
+def Set(category, key, value):
+    with _Lock:
+        cache = _Load(category)
+        if cache.get(key, None) != value:
+            cache[key] = value
+            _Dirty.add(category)
+
+def Memoize(category, key, func):
+    # Return stored result for key or compute, store and return it
+    rv = Get(category, key)
+    if rv is None:
+        rv = func()
+        if rv is not None:
+            Set(category, key, rv)
+    return rv
+
+def Spawn(cmds, env=None, shell=True):
+    # Run commands concurrently, return a list of (returncode, output) in the same order
+    procs = []
+    for cmd in cmds:
+        try:
+            procs.append(subprocess.Popen(cmd, shell=shell, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE))
+        except:
+            procs.append(None)
+    rv = []
+    for p in procs:
+        if p is None:
+            rv.append((-1, ""))
+            continue
+        out, _ = p.communicate()
+        rv.append((p.returncode, out.decode("UTF-8", "replace") if sys.version_info.major > 2 else out))
+    return rv
+
+@atexit.register
+def Write():
+    with _Lock:
+        if not _Dirty:
+            return
+        dn = Directory()
+        for category in sorted(_Dirty):
+            try:
+                if not os.path.isdir(dn):
+                    os.makedirs(dn)
+                # Write then rename so that concurrent builds never read partial files
+                fd, tmp = tempfile.mkstemp(dir=dn)
+                with os.fdopen(fd, "w") as f:
+                    json.dump(_Caches[category], f, indent=1, sort_keys=True)
+                getattr(os, "replace", os.rename)(tmp, excons.joinpath(dn, category + ".json"))
+            except:
+                excons.WarnOnce("Failed to write probe cache '%s'" % category)
+        _Dirty.clear()
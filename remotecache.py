@@ -0,0 +1,235 @@
+# MIT License
+#
+# Copyright (c) 2009 Gaetan Guidet
+#
+# This file is part of excons.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import io
+import sys
+import atexit
+import tempfile
+import threading
+import excons
+from excons import cachedir
+
+# pylint: disable=bare-except, broad-except
+
+if sys.version_info[0] > 2:
+    import queue
+    import urllib.request as urlrequest
+    import urllib.error as urlerror
+else:
+    import Queue as queue # pylint: disable=import-error
+    import urllib2 as urlrequest # pylint: disable=import-error
+    urlerror = urlrequest
+
+
+# Transports must implement:
+#   get(key) -> (bytes, mode) or None (when key is not in cache)
+#   put(key, data, mode) -> None
+# and raise an exception when the remote cache cannot be reached.
+# mode is the object file permission bits (None if unknown), it is only used to preserve the executable bit.
+
+ModeHeader = "X-Excons-Mode"
+
+def FileMode(mode):
+    # Cached objects are readable by everyone, executables keep their executable bit
+    return (0o755 if mode and (mode & 0o111) else 0o644)
+
+def _WriteFile(path, data, mode):
+    # Write then rename so that readers never see partial objects
+    dn = os.path.dirname(path)
+    if not os.path.isdir(dn):
+        try:
+            os.makedirs(dn)
+        except:
+            # Concurrent creation
+            pass
+    fd, tmp = tempfile.mkstemp(dir=dn)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    # mkstemp creates files only readable by the current user
+    os.chmod(tmp, FileMode(mode))
+    os.rename(tmp, path)
+
+class HTTPTransport(object):
+    def __init__(self, url, timeout=5.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def get(self, key):
+        try:
+            rsp = urlrequest.urlopen("%s/%s" % (self.url, key), timeout=self.timeout)
+            try:
+                mode = rsp.info().get(ModeHeader, None)
+                return (rsp.read(), (None if not mode else int(mode, 8)))
+            finally:
+                rsp.close()
+        except urlerror.HTTPError as e:
+            if e.code == 404:
+                return None
+            raise
+
+    def put(self, key, data, mode):
+        req = urlrequest.Request("%s/%s" % (self.url, key), data=data)
+        req.get_method = lambda: "PUT"
+        req.add_header("Content-Type", "application/octet-stream")
+        req.add_header(ModeHeader, "%o" % FileMode(mode))
+        urlrequest.urlopen(req, timeout=self.timeout).close()
+
+class FileTransport(object):
+    def __init__(self, url, timeout=5.0): # pylint: disable=unused-argument
+        self.root = url[len("file://"):] if url.startswith("file://") else url
+
+    def get(self, key):
+        path = os.path.join(self.root, key)
+        if not os.path.isfile(path):
+            return None
+        with io.open(path, "rb") as f:
+            return (f.read(), os.stat(path).st_mode)
+
+    def put(self, key, data, mode):
+        _WriteFile(os.path.join(self.root, key), data, mode)
+
+Transports = {"http": HTTPTransport,
+              "https": HTTPTransport,
+              "file": FileTransport}
+
+def RegisterTransport(scheme, cls):
+    Transports[scheme] = cls
+
+def CreateTransport(url, timeout=5.0):
+    scheme = (url.split("://")[0] if "://" in url else "file")
+    cls = Transports.get(scheme, None)
+    if cls is None:
+        excons.WarnOnce("Unsupported remote cache transport '%s'" % scheme, tool="remote-cache")
+        return None
+    return cls(url, timeout=timeout)
+
+
+class Uploader(object):
+    def __init__(self, transport):
+        self.transport = transport
+        self.queue = queue.Queue()
+        self.thread = None
+        self.failed = False
+        self.uploaded = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            key, path = item
+            if self.failed:
+                continue
+            try:
+                with io.open(path, "rb") as f:
+                    self.transport.put(key, f.read(), os.stat(path).st_mode)
+                self.uploaded += 1
+            except Exception as e:
+                excons.WarnOnce("Upload failed, disable remote cache uploads (%s)" % e, tool="remote-cache")
+                self.failed = True
+
+    def push(self, key, path):
+        if self.thread is None:
+            self.start()
+        self.queue.put((key, path))
+
+    def flush(self, timeout=None):
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                excons.WarnOnce("%d upload(s) abandoned" % self.queue.qsize(), tool="remote-cache")
+
+
+class RemoteCacheDir(cachedir.ManagedCacheDir):
+    transport = None
+    uploader = None
+    prefix = ""
+    readonly = False
+    failed = False
+    downloaded = 0
+
+    def key(self, node):
+        return self.prefix + node.get_cachedir_bsig()
+
+    def fetch(self, node):
+        # Read-through: copy remote object to local cache directory before SCons retrieves it
+        _, cachefile = self.cachepath(node)
+        if cachefile is None or os.path.exists(cachefile):
+            return
+        try:
+            rv = RemoteCacheDir.transport.get(self.key(node))
+        except Exception as e:
+            excons.WarnOnce("Cannot reach remote cache, disable it (%s)" % e, tool="remote-cache")
+            RemoteCacheDir.failed = True
+            return
+        if rv is None:
+            return
+        try:
+            # SCons applies the cached file mode to the retrieved target
+            _WriteFile(cachefile, rv[0], rv[1])
+            RemoteCacheDir.downloaded += 1
+        except Exception as e:
+            excons.WarnOnce("Failed to store remote cache object locally (%s)" % e, tool="remote-cache")
+
+    def retrieve(self, node):
+        if self.is_enabled() and not RemoteCacheDir.failed:
+            self.fetch(node)
+        return super(RemoteCacheDir, self).retrieve(node)
+
+    def push(self, node):
+        rv = super(RemoteCacheDir, self).push(node)
+        if self.is_enabled() and not RemoteCacheDir.readonly and not RemoteCacheDir.failed:
+            _, cachefile = self.cachepath(node)
+            if cachefile and os.path.isfile(cachefile):
+                RemoteCacheDir.uploader.push(self.key(node), cachefile)
+        return rv
+
+
+def PrintStats():
+    uploaded = (0 if RemoteCacheDir.uploader is None else RemoteCacheDir.uploader.uploaded)
+    if RemoteCacheDir.downloaded or uploaded:
+        excons.Print("%d object(s) downloaded, %d object(s) uploaded" % (RemoteCacheDir.downloaded, uploaded), tool="remote-cache")
+
+def Setup(url, key):
+    if RemoteCacheDir.transport is None:
+        timeout = excons.GetArgument("remote-cache-timeout", 5.0, float)
+        transport = CreateTransport(url, timeout=timeout)
+        if transport is None:
+            return None
+        RemoteCacheDir.transport = transport
+        RemoteCacheDir.uploader = Uploader(transport)
+        RemoteCacheDir.prefix = key.replace("\\", "/") + "/"
+        RemoteCacheDir.readonly = (excons.GetArgument("remote-cache-readonly", 0, int) != 0)
+        # atexit handlers run last in first out: flush pending uploads before printing stats
+        atexit.register(PrintStats)
+        atexit.register(RemoteCacheDir.uploader.flush, excons.GetArgument("remote-cache-flush-timeout", 60.0, float))
+    return RemoteCacheDir
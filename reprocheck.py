@@ -0,0 +1,126 @@
+# MIT License
+#
+# Copyright (c) 2009 Gaetan Guidet
+#
+# This file is part of excons.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Verify that an excons project builds reproducibly
+#
+# Usage: python excons/reprocheck.py [--scons <cmd>] [<scons arguments>...]
+#
+# Run from the directory containing the SConstruct. The project is built twice
+# with 'reproducible=1', each time using a different intermediate directory
+# ('bld-dir=' flag) and with build caches disabled. Files created or modified by
+# the first build are then compared with the ones produced by the second build.
+#
+# This module doesn't depend on SCons nor excons so that it can run standalone.
+
+
+import os
+import sys
+import shutil
+import hashlib
+import argparse
+import tempfile
+import subprocess
+
+
+Ignored = set([".git", ".svn", ".hg", ".build", "excons.cache", ".sconf_temp"])
+
+def Snapshot(root):
+    rv = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [x for x in dirnames if x not in Ignored]
+        for filename in filenames:
+            if filename in Ignored or filename.startswith(".sconsign") or filename.endswith(".pyc"):
+                continue
+            path = os.path.join(dirpath, filename)
+            if os.path.islink(path):
+                continue
+            h = hashlib.sha1()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(65536), b""):
+                    h.update(chunk)
+            rv[os.path.relpath(path, root).replace("\\", "/")] = h.hexdigest()
+    return rv
+
+def Build(scons, args, blddir):
+    cmd = scons + args + ["reproducible=1", "bld-dir=%s" % blddir, "cache-dir=", "remote-cache="]
+    print("[reprocheck] %s" % " ".join(cmd))
+    return subprocess.call(cmd)
+
+def Clean(scons, args, blddir):
+    cmd = scons + ["-c"] + args + ["reproducible=1", "bld-dir=%s" % blddir, "cache-dir=", "remote-cache="]
+    return subprocess.call(cmd, stdout=subprocess.PIPE)
+
+def Check(scons, args):
+    root = os.path.abspath(".")
+    tmpdir = tempfile.mkdtemp(prefix="reprocheck_")
+
+    # Builds must not alter the project's cached flags
+    cachefile = os.path.join(root, "excons.cache")
+    cachebak = None
+    if os.path.isfile(cachefile):
+        cachebak = os.path.join(tmpdir, "excons.cache")
+        shutil.copy2(cachefile, cachebak)
+
+    try:
+        before = Snapshot(root)
+
+        if Build(scons, args, os.path.join(tmpdir, "a")) != 0:
+            print("[reprocheck] First build failed")
+            return 1
+        first = Snapshot(root)
+        # Only consider build outputs
+        outputs = sorted([k for k, v in first.items() if before.get(k, None) != v])
+
+        Clean(scons, args, os.path.join(tmpdir, "a"))
+
+        if Build(scons, args, os.path.join(tmpdir, "b")) != 0:
+            print("[reprocheck] Second build failed")
+            return 1
+        second = Snapshot(root)
+
+        mismatches = 0
+        for path in outputs:
+            if second.get(path, None) != first[path]:
+                print("[reprocheck] Differs: %s" % path)
+                mismatches += 1
+
+        if mismatches:
+            print("[reprocheck] %d of %d output(s) are not reproducible" % (mismatches, len(outputs)))
+            return 1
+        else:
+            print("[reprocheck] %d output(s) are reproducible" % len(outputs))
+            return 0
+
+    finally:
+        if cachebak:
+            shutil.copy2(cachebak, cachefile)
+        elif os.path.isfile(cachefile):
+            os.remove(cachefile)
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build excons project twice and compare outputs")
+    parser.add_argument("--scons", default="scons", help="SCons command")
+    opts, rest = parser.parse_known_args()
+    sys.exit(Check(opts.scons.split(), rest))
@@ -0,0 +1,63 @@
+# MIT License
+#
+# Copyright (c) 2009 Gaetan Guidet
+#
+# This file is part of excons.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+# Unit tests for excons helpers that don't need a full SCons run
+#
+#   python -m pytest test
+
+
+import os
+import sys
+import importlib.util
+import pytest
+
+Root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DataDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def _ImportExcons():
+    # The repository directory may not be named 'excons': load it explicitly
+    if "excons" in sys.modules:
+        return sys.modules["excons"]
+    spec = importlib.util.spec_from_file_location("excons", os.path.join(Root, "__init__.py"), submodule_search_locations=[Root])
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules["excons"] = mod
+    spec.loader.exec_module(mod)
+    return mod
+
+excons = _ImportExcons()
+# Don't read or write excons.cache
+excons.args_no_cache = True
+
+
+@pytest.fixture
+def probedir(tmp_path, monkeypatch):
+    # Fresh probe cache in a temporary build directory
+    from excons import probecache
+    monkeypatch.setattr(excons, "bld_dir", str(tmp_path))
+    monkeypatch.setattr(probecache, "_Caches", {})
+    monkeypatch.setattr(probecache, "_Dirty", set())
+    return tmp_path
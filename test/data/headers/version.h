@@ -0,0 +1,11 @@
+#ifndef SDK_VERSION_H
+#define SDK_VERSION_H
+
+#define SDK_MAJOR 5 /* major version */
+#define SDK_MINOR   2 // minor version
+#  define SDK_NAME "sdk"
+#define SDK_EMPTY
+#define SDK_FUNC(x) (x)
+#define SDK_MAJOR 6
+
+#endif
@@ -0,0 +1,66 @@
+# MIT License
+#
+# Copyright (c) 2009 Gaetan Guidet
+#
+# This file is part of excons.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import pytest
+from excons import cachedir
+
+
+@pytest.mark.parametrize("s, expected", [("100", 100),
+                                         ("1k", 1024),
+                                         ("1.5kb", 1536),
+                                         ("500M", 500 * 1024 ** 2),
+                                         ("20g", 20 * 1024 ** 3),
+                                         ("", None),
+                                         ("abc", None),
+                                         ("10x", None)])
+def test_parse_size(s, expected):
+    assert cachedir.ParseSize(s) == expected
+
+def _Entry(path, size, mtime):
+    d = os.path.dirname(path)
+    if not os.path.isdir(d):
+        os.makedirs(d)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    os.utime(path, (mtime, mtime))
+
+def test_prune(tmp_path):
+    root = str(tmp_path)
+    _Entry(os.path.join(root, "config"), 10, 0)
+    _Entry(os.path.join(root, "aa", "old"), 100, 1000)
+    _Entry(os.path.join(root, "bb", "mid"), 100, 2000)
+    _Entry(os.path.join(root, "cc", "new"), 100, 3000)
+    assert cachedir.Prune(root, 250, verbose=False) == 100
+    # Least recently used entry goes first, SCons configuration is kept
+    assert not os.path.exists(os.path.join(root, "aa", "old"))
+    assert os.path.exists(os.path.join(root, "bb", "mid"))
+    assert os.path.exists(os.path.join(root, "cc", "new"))
+    assert os.path.exists(os.path.join(root, "config"))
+
+def test_prune_under_limit(tmp_path):
+    _Entry(os.path.join(str(tmp_path), "aa", "a"), 100, 1000)
+    assert cachedir.Prune(str(tmp_path), 1000, verbose=False) == 0
+    assert cachedir.Prune(str(tmp_path), None, verbose=False) == 0
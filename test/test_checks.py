@@ -0,0 +1,79 @@
+# MIT License
+#
+# Copyright (c) 2009 Gaetan Guidet
+#
+# This file is part of excons.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import sys
+import shutil
+import pytest
+from excons import checks
+from excons import probecache
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32" or shutil.which("gcc") is None or shutil.which("g++") is None,
+                                reason="requires gcc")
+
+
+@pytest.fixture
+def env(probedir, monkeypatch):
+    import SCons.Environment # pylint: disable=import-error
+    monkeypatch.setattr(checks, "_Results", {})
+    monkeypatch.chdir(str(probedir))
+    return SCons.Environment.Environment(tools=["gcc", "g++", "gnulink"], ENV={"PATH": os.environ["PATH"]})
+
+def test_run(env):
+    rv = checks.Run(env, [("flag", "-O2"),
+                          ("flag", "-fexcons-bogus-flag"),
+                          ("flag", "-Wl,--as-needed", {"link": True}),
+                          ("header", "stdio.h"),
+                          ("header", "excons_missing.h"),
+                          ("symbol", "printf", {"headers": "stdio.h"}),
+                          ("symbol", "excons_missing", {"headers": "stdio.h"}),
+                          ("lib", "m", {"symbol": "cos", "lang": "c"}),
+                          ("lib", "excons_missing"),
+                          ("source", "int main() { return 0; }\n", {"link": True}),
+                          ("source", "#error failed\n"),
+                          ("bogus", "")])
+    assert rv == [True, False, True, True, False, True, False, True, False, True, False, False]
+    # Temporary files are removed
+    assert not os.path.isdir(os.path.join(probecache.Directory(), "tmp"))
+
+def test_cached(env, monkeypatch):
+    assert checks.Header(env, "stdio.h")
+    assert probecache.Get("checks", list(checks._Results.keys())[0]) is True # pylint: disable=protected-access
+    # Next run reads the probe cache and doesn't compile anything
+    monkeypatch.setattr(checks, "_Results", {})
+    monkeypatch.setattr(probecache, "Spawn", lambda *args, **kwargs: pytest.fail("unexpected compilation"))
+    assert checks.Header(env, "stdio.h")
+
+def test_key_depends_on_flags(env):
+    assert checks.Source(env, "#ifndef EXCONS_CHECK\n#error\n#endif\nint main() { return 0; }\n") is False
+    env.Append(CPPDEFINES=["EXCONS_CHECK"])
+    assert checks.Source(env, "#ifndef EXCONS_CHECK\n#error\n#endif\nint main() { return 0; }\n") is True
+
+def test_build_stage_flags_ignored(env):
+    # pgo=use adds warnings to any test program: flag checks must not fail because of them
+    env["PGO_CCFLAGS"] = ["-fprofile-use=%s" % os.getcwd(), "-Wmissing-profile"]
+    env.Append(CCFLAGS=["$PGO_CCFLAGS", "-gsplit-dwarf"])
+    assert checks.Flag(env, "-O2")
+    assert checks.Flag(env, "-Wl,--as-needed", link=True)
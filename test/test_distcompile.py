@@ -0,0 +1,59 @@
+# MIT License
+#
+# Copyright (c) 2009 Gaetan Guidet
+#
+# This file is part of excons.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import pytest
+from excons import distcompile
+
+
+def _Job(args):
+    job = distcompile.Job("gcc", args)
+    return job, job.parse()
+
+def test_parse_compile():
+    job, ok = _Job(["-c", "-O2", "-Iinc", "-D", "A=1", "-include", "cfg.h", "-fPIC", "src/a.cpp", "-o", "a.o"])
+    assert ok
+    assert job.source == "src/a.cpp"
+    assert job.output == "a.o"
+    assert job.lang == "c++"
+    # Preprocessor flags stay local, code generation flags are sent to workers
+    assert job.cpp_args == ["-O2", "-Iinc", "-D", "A=1", "-include", "cfg.h", "-fPIC"]
+    assert job.remote_args == ["-O2", "-fPIC"]
+
+def test_parse_attached_output():
+    job, ok = _Job(["-c", "a.c", "-oa.o"])
+    assert ok
+    assert job.output == "a.o"
+    assert job.lang == "c"
+
+@pytest.mark.parametrize("args", [["a.c", "-o", "a"],                          # link
+                                  ["-c", "a.c", "b.c", "-o", "a.o"],           # several sources
+                                  ["-c", "-x", "c", "a.txt", "-o", "a.o"],     # explicit language
+                                  ["-c", "-MD", "a.c", "-o", "a.o"],           # local dependency file
+                                  ["-c", "-gsplit-dwarf", "a.c", "-o", "a.o"], # extra output
+                                  ["-c", "-flto", "a.c", "-o", "a.o"],
+                                  ["-c", "a.f90", "-o", "a.o"],                # unknown language
+                                  ["-c", "a.c", "-o"]])
+def test_parse_local_only(args):
+    assert not _Job(args)[1]
@@ -0,0 +1,52 @@
+# MIT License
+#
+# Copyright (c) 2009 Gaetan Guidet
+#
+# This file is part of excons.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import excons
+from excons import probecache
+from conftest import DataDir
+
+Header = os.path.join(DataDir, "headers", "version.h")
+
+
+def test_header_defines(probedir):
+    rv = excons.HeaderDefines(Header, ["SDK_MAJOR", "SDK_MINOR", "SDK_NAME", "SDK_EMPTY", "SDK_MISSING"])
+    # First definition wins, comments are stripped, missing macros are left out
+    assert rv == {"SDK_MAJOR": "5", "SDK_MINOR": "2", "SDK_NAME": "\"sdk\"", "SDK_EMPTY": ""}
+
+def test_header_defines_single_name(probedir):
+    assert excons.HeaderDefines(Header, "SDK_MINOR") == {"SDK_MINOR": "2"}
+
+def test_header_defines_missing_file(probedir):
+    assert excons.HeaderDefines(os.path.join(DataDir, "headers", "missing.h"), "A") == {}
+
+def test_header_defines_cached(probedir, tmp_path):
+    path = tmp_path / "v.h"
+    path.write_text(u"#define V 1\n")
+    assert excons.HeaderDefines(str(path), "V") == {"V": "1"}
+    assert probecache.Get("headers", "%s|V" % probecache.FileKey(str(path))) == {"V": "1"}
+    # Modified header is parsed again
+    path.write_text(u"#define V 23\n")
+    assert excons.HeaderDefines(str(path), "V") == {"V": "23"}
@@ -0,0 +1,44 @@
+# MIT License
+#
+# Copyright (c) 2009 Gaetan Guidet
+#
+# This file is part of excons.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import sys
+import pytest
+from excons.tools import houdini
+
+
+def test_parse_compile_flags():
+    flags = r'-DVERSION=\"19.5.303\" -D_GNU_SOURCE -D AMD64 -m64 -fPIC -I . -I "/opt/hfs 19.5/toolkit/include" -std=c++17 -DNAME="a b"'
+    rv = houdini._ParseCompileFlags(flags) # pylint: disable=protected-access
+    # Values are kept as is so that command lines match hcustom's
+    assert rv["CPPDEFINES"] == [("VERSION", r'\"19.5.303\"'), "_GNU_SOURCE", "AMD64", ("NAME", '"a b"')]
+    assert rv["CPPPATH"] == [".", "/opt/hfs 19.5/toolkit/include"]
+    assert rv["CXXFLAGS"] == ["-m64", "-fPIC", "-std=c++17"]
+
+@pytest.mark.skipif(sys.platform == "win32", reason="unix link flags")
+def test_parse_link_flags():
+    rv = houdini._ParseLinkFlags("-L/usr/X11R6/lib64 -L /opt/hfs/dsolib -ldl -lm -Wl,-rpath,/opt/hfs/dsolib -framework Cocoa") # pylint: disable=protected-access
+    assert rv["LIBPATH"] == ["/usr/X11R6/lib64", "/opt/hfs/dsolib"]
+    assert rv["LIBS"] == ["dl", "m"]
+    assert rv["LINKFLAGS"] == ["-Wl,-rpath,/opt/hfs/dsolib", "-framework", "Cocoa"]
@@ -0,0 +1,151 @@
+# MIT License
+#
+# Copyright (c) 2009 Gaetan Guidet
+#
+# This file is part of excons.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import os
+import shutil
+import subprocess
+import pytest
+from conftest import DataDir
+from excons.tools import pkgconfig
+
+PCDir = os.path.join(DataDir, "pkgconfig")
+
+
+@pytest.fixture(autouse=True)
+def pcpath(probedir, monkeypatch):
+    # Only search test files
+    monkeypatch.setenv("PKG_CONFIG_LIBDIR", PCDir)
+    monkeypatch.delenv("PKG_CONFIG_PATH", raising=False)
+    monkeypatch.setattr(pkgconfig, "_Parsed", {})
+    monkeypatch.setattr(pkgconfig, "_Resolved", {})
+    return PCDir
+
+def _PCFile(name):
+    return os.path.join(PCDir, name + ".pc")
+
+def _Root():
+    return os.path.dirname(os.path.abspath(_PCFile("core"))).replace("\\", "/") + "/root"
+
+
+def test_parse_variables():
+    pc = pkgconfig.Parse(_PCFile("core"))
+    assert pc["variables"]["libdir"] == _Root() + "/lib"
+    assert pc["variables"]["price"] == "$5"
+    assert pc["fields"]["Version"] == "1.10.2"
+    assert pc["fields"]["Cflags"] == "-I%s/include -DCORE_ON -DCORE_LEVEL=2" % _Root()
+
+def test_parse_cached_by_file(probedir):
+    path = _PCFile("core")
+    pkgconfig.Parse(path)
+    from excons import probecache
+    assert probecache.Get("pkgconfig", probecache.FileKey(path)) is not None
+
+def test_parse_requires():
+    assert pkgconfig.ParseRequires("foo >= 1.0, bar baz<2,qux != 3") == [("foo", ">=", "1.0"),
+                                                                         ("bar", None, None),
+                                                                         ("baz", "<", "2"),
+                                                                         ("qux", "!=", "3")]
+    assert pkgconfig.ParseRequires("") == []
+
+@pytest.mark.parametrize("v0, v1, expected", [("1.10", "1.9", 1),
+                                              ("1.0", "1.0", 0),
+                                              ("1.0a", "1.0", 1),
+                                              ("1.0", "1.0.1", -1),
+                                              ("2.0rc1", "2.0.1", -1),
+                                              ("10", "9", 1)])
+def test_compare_versions(v0, v1, expected):
+    assert pkgconfig.CompareVersions(v0, v1) == expected
+    assert pkgconfig.CompareVersions(v1, v0) == -expected
+
+def test_flags_shared():
+    flags = pkgconfig.Flags("util")
+    assert flags["CPPPATH"] == [_Root() + "/include/util", _Root() + "/include"]
+    # Private requirements compile flags are needed, not their libraries
+    assert flags["CPPDEFINES"] == ["ZPRIV", "CORE_ON", ("CORE_LEVEL", "2")]
+    assert flags["LIBPATH"] == [_Root() + "/lib"]
+    assert flags["LIBS"] == ["util", "core"]
+    assert flags["VERSIONS"] == {"util": "2.0", "core": "1.10.2", "zpriv": "0.3"}
+
+def test_flags_static():
+    flags = pkgconfig.Flags("util", static=True)
+    assert "CORE_STATIC" in flags["CPPDEFINES"]
+    assert flags["LIBS"] == ["util", "zpriv", "core", "m"]
+
+def test_flags_private_and_public():
+    # zpriv is a private dependency of util but a public one of app
+    assert pkgconfig.Flags("app")["LIBS"] == ["app", "util", "zpriv", "core"]
+
+def test_flags_requested_order():
+    assert pkgconfig.Flags("zpriv core")["LIBS"] == ["zpriv", "core"]
+    assert pkgconfig.Flags("core zpriv")["LIBS"] == ["core", "zpriv"]
+
+def test_flags_version_constraints():
+    assert pkgconfig.Flags("core >= 1.9") is not None
+    assert pkgconfig.Flags("core < 1.9", silent=True) is None
+    assert pkgconfig.Exists("util")
+    assert not pkgconfig.Exists("broken")
+    assert not pkgconfig.Exists("does-not-exist")
+
+def test_flags_argument_pairs():
+    flags = pkgconfig.Flags("isys-a isys-b")
+    assert flags["CCFLAGS"] == ["-isystem", "/opt/a/include", "-include", "/opt/a/cfg.h",
+                                "-isystem", "/opt/b/include", "-include", "/opt/b/cfg.h"]
+    assert flags["LINKFLAGS"] == ["-framework", "Foo"]
+    assert flags["LIBS"] == ["a", "b"]
+
+def test_flags_linker_sections():
+    flags = pkgconfig.Flags("section")
+    assert flags["LIBS"] == ["section", "rt"]
+    assert flags["LIBFLAGS"] == ["-Wl,--push-state,--as-needed", "-latomic", "-Wl,--pop-state"]
+    assert flags["LINKFLAGS"] == []
+
+def test_version_and_variable():
+    assert pkgconfig.Version("zpriv") == "0.3"
+    assert pkgconfig.Variable("core", "includedir") == _Root() + "/include"
+    assert pkgconfig.Version("does-not-exist") is None
+
+
+def _CommandLine(flags):
+    # Same kind of output as pkg-config --cflags --libs
+    defs = [("-D%s" % x if not isinstance(x, tuple) else "-D%s=%s" % x) for x in flags["CPPDEFINES"]]
+    return (["-I" + x for x in flags["CPPPATH"]] + defs + flags["CCFLAGS"] +
+            ["-L" + x for x in flags["LIBPATH"]] + flags["LINKFLAGS"] +
+            ["-l" + x for x in flags["LIBS"]] + flags["LIBFLAGS"])
+
+@pytest.mark.skipif(shutil.which("pkg-config") is None, reason="pkg-config not available")
+@pytest.mark.parametrize("name", ["core", "util", "app", "isys-a isys-b", "section"])
+@pytest.mark.parametrize("static", [False, True])
+def test_compare_pkgconfig(name, static):
+    cmd = ["pkg-config", "--cflags", "--libs"] + (["--static"] if static else []) + name.split()
+    out = subprocess.check_output(cmd, env=dict(os.environ, PKG_CONFIG_LIBDIR=PCDir)).decode("UTF-8")
+    expected = out.split()
+    flags = _CommandLine(pkgconfig.Flags(name, static=static))
+    # pkg-config may repeat libraries: compare flags, then what follows options and sections
+    assert set(flags) == set(expected)
+    pairs = set(zip(expected, expected[1:]))
+    for i, flag in enumerate(flags):
+        if flag in ("-isystem", "-include", "-framework") or flag.startswith("-Wl,--push-state"):
+            assert (flag, flags[i+1]) in pairs
@@ -0,0 +1,67 @@
+# MIT License
+#
+# Copyright (c) 2009 Gaetan Guidet
+#
+# This file is part of excons.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import json
+from excons import probecache
+
+
+def test_file_key(tmp_path):
+    path = tmp_path / "a.txt"
+    assert probecache.FileKey(str(path)) is None
+    path.write_text(u"a")
+    key = probecache.FileKey(str(path))
+    assert key.startswith(str(path).replace("\\", "/"))
+    path.write_text(u"ab")
+    assert probecache.FileKey(str(path)) != key
+
+def test_memoize(probedir):
+    calls = []
+    def _Probe():
+        calls.append(1)
+        return {"value": 42}
+    assert probecache.Memoize("test", "key", _Probe) == {"value": 42}
+    assert probecache.Memoize("test", "key", _Probe) == {"value": 42}
+    assert len(calls) == 1
+
+def test_memoize_none_not_stored(probedir):
+    probecache.Memoize("test", "key", lambda: None)
+    assert probecache.Get("test", "key") is None
+    assert not probecache._Dirty # pylint: disable=protected-access
+
+def test_write_and_reload(probedir, monkeypatch):
+    probecache.Set("test", "key", [1, "two"])
+    probecache.Write()
+    path = os.path.join(str(probedir), "probes", "test.json")
+    with open(path) as f:
+        assert json.load(f) == {"key": [1, "two"]}
+    # New run
+    monkeypatch.setattr(probecache, "_Caches", {})
+    assert probecache.Get("test", "key") == [1, "two"]
+
+def test_spawn():
+    rv = probecache.Spawn(["echo hello", "exit 3"])
+    assert rv[0] == (0, "hello\n")
+    assert rv[1][0] == 3
@@ -0,0 +1,111 @@
+# MIT License
+#
+# Copyright (c) 2009 Gaetan Guidet
+#
+# This file is part of excons.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import sys
+import stat
+import shutil
+import threading
+import subprocess
+import pytest
+from conftest import Root
+from excons import remotecache
+from excons import cacheserver
+
+
+@pytest.fixture
+def server(tmp_path):
+    root = str(tmp_path / "server")
+    srv = cacheserver.Serve(port=0, root=root, quiet=True)
+    thread = threading.Thread(target=srv.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        yield ("http://127.0.0.1:%d" % srv.server_address[1], root)
+    finally:
+        srv.shutdown()
+        srv.server_close()
+
+def _Mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+@pytest.mark.parametrize("mode, expected", [(0o100755, 0o755),
+                                            (0o100700, 0o755),
+                                            (0o100600, 0o644),
+                                            (None, 0o644)])
+def test_file_mode(mode, expected):
+    assert remotecache.FileMode(mode) == expected
+
+def test_http(server):
+    url, root = server
+    transport = remotecache.CreateTransport(url)
+    transport.put("key/exe", b"\x7fELF", 0o100700)
+    transport.put("key/obj", b"obj", 0o100600)
+    assert _Mode(os.path.join(root, "key", "exe")) == 0o755
+    assert _Mode(os.path.join(root, "key", "obj")) == 0o644
+    assert transport.get("key/exe") == (b"\x7fELF", 0o755)
+    assert transport.get("key/obj") == (b"obj", 0o644)
+    assert transport.get("key/missing") is None
+    with pytest.raises(Exception):
+        transport.get("key/../../outside")
+
+def test_file(tmp_path):
+    transport = remotecache.CreateTransport("file://" + str(tmp_path))
+    transport.put("key/exe", b"\x7fELF", 0o100700)
+    assert _Mode(str(tmp_path / "key" / "exe")) == 0o755
+    data, mode = transport.get("key/exe")
+    assert data == b"\x7fELF" and remotecache.FileMode(mode) == 0o755
+    assert transport.get("key/missing") is None
+
+@pytest.mark.skipif(sys.platform == "win32" or shutil.which("gcc") is None, reason="requires gcc")
+def test_build(server, tmp_path):
+    url, _ = server
+    proj = tmp_path / "proj"
+    proj.mkdir()
+    # SConstruct imports excons from the repository whatever its directory name
+    os.symlink(Root, str(tmp_path / "excons"))
+    (proj / "main.c").write_text(u"int main() { return 0; }\n")
+    (proj / "SConstruct").write_text(u"import sys\n"
+                                     u"sys.path.insert(0, %r)\n"
+                                     u"import excons\n"
+                                     u"env = excons.MakeBaseEnv()\n"
+                                     u"excons.DeclareTargets(env, [{'name': 'app', 'type': 'program', 'srcs': ['main.c']}])\n" % str(tmp_path))
+
+    def _Build():
+        for d in ("release", ".build"):
+            shutil.rmtree(str(proj / d), ignore_errors=True)
+        out = subprocess.check_output([sys.executable, "-m", "SCons", "-Q", "remote-cache=" + url, "no-arch=1"],
+                                      cwd=str(proj), stderr=subprocess.STDOUT).decode("UTF-8", "replace")
+        os.remove(str(proj / "excons.cache"))
+        return out
+
+    _Build()
+    # Local cache is gone: program is downloaded from the server
+    out = _Build()
+    assert "2 object(s) downloaded" in out
+    app = [os.path.join(d, f) for d, _, fs in os.walk(str(proj / "release")) for f in fs if f == "app"]
+    assert len(app) == 1
+    assert _Mode(app[0]) & 0o111
+    assert subprocess.call([app[0]]) == 0
@@ -0,0 +1,139 @@
+# MIT License
+#
+# Copyright (c) 2009 Gaetan Guidet
+#
+# This file is part of excons.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import os
+import sys
+import excons
+from excons.tools import tbb
+
+
+Allocators = ("system", "mimalloc", "jemalloc", "tbbmalloc")
+
+def GetOptionsString():
+    return """ALLOCATOR OPTIONS
+  allocator=<str>       : Memory allocator replacing malloc/free.    [system]
+                          One of 'system', 'mimalloc', 'jemalloc' or 'tbbmalloc'.
+  with-<alloc>=<path>   : Allocator root directory (see 'ext_<alloc>' options).
+                          <alloc>-name=, <alloc>-prefix= and <alloc>-suffix= set library name.
+                          tbbmalloc uses TBB options (with-tbb=, tbb-prefix=, tbb-suffix=).
+  <alloc>-static=0|1    : Link allocator statically in programs.    [0]
+                          (ignored for shared libraries and plugins)"""
+
+def Name():
+    name = excons.GetArgument("allocator", "system")
+    if name not in Allocators:
+        excons.WarnOnce("Invalid 'allocator' value '%s', use 'system'." % name, tool="allocator")
+        name = "system"
+    return name
+
+def _BaseName(name, proxy):
+    # Library base name, before <alloc>-prefix and <alloc>-suffix are applied
+    if name == "mimalloc" and proxy and sys.platform == "win32":
+        return "mimalloc-override"
+    else:
+        return name
+
+def _Libraries(name, libname):
+    # Libraries to link, the one replacing malloc first
+    if name == "tbbmalloc":
+        # tbbmalloc itself doesn't replace malloc, its proxy does
+        return [tbb.LibraryName("tbbmalloc_proxy"), tbb.LibraryName("tbbmalloc")]
+    else:
+        return [libname]
+
+def _LibraryPath(libdir, lib, static):
+    if sys.platform == "win32":
+        return "%s/%s.lib" % (libdir, lib)
+    else:
+        return "%s/lib%s%s" % (libdir, lib, (".a" if static else excons.SharedLibraryLinkExt()))
+
+def _LibraryDirectory(libdir, libs, static):
+    # Same lookup as excons.ExternalLibRequire: prefer <libdir>64 for 64 bit builds when it has the libraries
+    if sys.platform != "win32" and excons.arch_dir == "x64" and not libdir.endswith("64"):
+        if all([os.path.isfile(_LibraryPath(libdir + "64", x, static)) for x in libs]):
+            return libdir + "64"
+    return libdir
+
+def _Setup(env, proxy):
+    name = Name()
+    if name == "system":
+        return
+
+    # ExternalLibRequire only resolves directories and adds headers path: link order matters here
+    rv = excons.ExternalLibRequire("tbb" if name == "tbbmalloc" else name, libnameFunc=lambda static: _BaseName(name, proxy), noLink=True)
+    if rv["require"] is None:
+        excons.WarnOnce("Could not find '%s', use system allocator (use with-%s= flag)." % (name, "tbb" if name == "tbbmalloc" else name), tool="allocator")
+        return
+    rv["require"](env)
+
+    static = rv["static"]
+    if static and (proxy or name == "tbbmalloc"):
+        # Two heaps in the same process: memory allocated by the host freed by the plugin, or vice-versa
+        excons.WarnOnce("%s can't be linked statically in %s, link shared library." % (name, "shared libraries" if proxy else "programs"), tool="allocator")
+        static = False
+
+    libs = _Libraries(name, rv["libname"])
+    libdir = _LibraryDirectory(rv["libdir"], libs, static)
+    paths = [_LibraryPath(libdir, x, static) for x in libs]
+
+    if not static and sys.platform != "win32":
+        # Libraries are linked by path: make them found at runtime outside of the build host's library path
+        env.Append(RPATHS=[libdir])
+
+    if sys.platform == "win32":
+        env.Append(LIBS=[env.File(x) for x in paths])
+        # Keep the override libraries even though no symbol is referenced directly
+        if name == "tbbmalloc":
+            env.Append(LINKFLAGS=" /INCLUDE:%s__TBB_malloc_proxy" % ("" if excons.arch_dir == "x64" else "_"))
+        elif name == "mimalloc":
+            env.Append(LINKFLAGS=" /INCLUDE:%smi_version" % ("" if excons.arch_dir == "x64" else "_"))
+
+    elif sys.platform == "darwin":
+        if static:
+            env.Append(LINKFLAGS=["-Wl,-force_load,%s" % x for x in paths])
+        else:
+            # LINKFLAGS come before objects and libraries: first in load order
+            env.Append(LINKFLAGS=paths)
+
+    else:
+        # LINKFLAGS come before objects and libraries: allocator is the first needed library and
+        #   wins symbol interposition over other libraries (and libc)
+        if static:
+            env.Append(LINKFLAGS=["-Wl,--whole-archive"] + paths + ["-Wl,--no-whole-archive"])
+            env.Append(LIBS=["pthread"])
+        else:
+            # The proxy libraries are not referenced directly: don't let --as-needed drop them
+            env.Append(LINKFLAGS=["-Wl,--push-state,--no-as-needed"] + paths + ["-Wl,--pop-state"])
+
+def Require(env):
+    # For program and testprograms targets
+    _Setup(env, False)
+    excons.AddHelpOptions(allocator=GetOptionsString())
+
+def RequireProxy(env):
+    # For sharedlib and dynamicmodule targets (plugins), always use shared override libraries
+    _Setup(env, True)
+    excons.AddHelpOptions(allocator=GetOptionsString())
@@ -25,9 +25,9 @@
 
 import SCons.Script # pylint: disable=import-error
 import excons
+from excons import checks
 import sys
 import re
-import io
 import os
 
 
@@ -58,22 +58,19 @@ def Version(asString=True, compat=False):
 
     varch, vmaj, vmin, vpatch = 0, 0, 0, 0
 
-    if os.path.isfile(ai_version):
-        defexp = re.compile(r"^\s*#define\s+AI_VERSION_(ARCH_NUM|MAJOR_NUM|MINOR_NUM|FIX)\s+([^\s]+)")
-        with io.open(ai_version, "r", encoding="UTF-8", newline="\n") as f:
-            for line in f.readlines():
-                m = defexp.match(line)
-                if m:
-                    which = m.group(1)
-                    if which == "ARCH_NUM":
-                        varch = int(m.group(2))
-                    elif which == "MAJOR_NUM":
-                        vmaj = int(m.group(2))
-                    elif which == "MINOR_NUM":
-                        vmin = int(m.group(2))
-                    elif which == "FIX":
-                        m = re.search(r"\d+", m.group(2))
-                        vpatch = (0 if m is None else int(m.group(0)))
+    defs = excons.HeaderDefines(ai_version, ["AI_VERSION_ARCH_NUM", "AI_VERSION_MAJOR_NUM", "AI_VERSION_MINOR_NUM", "AI_VERSION_FIX"])
+    for which, val in defs.items():
+        m = re.search(r"\d+", val)
+        if m is None:
+            continue
+        if which == "AI_VERSION_ARCH_NUM":
+            varch = int(m.group(0))
+        elif which == "AI_VERSION_MAJOR_NUM":
+            vmaj = int(m.group(0))
+        elif which == "AI_VERSION_MINOR_NUM":
+            vmin = int(m.group(0))
+        elif which == "AI_VERSION_FIX":
+            vpatch = int(m.group(0))
 
     rv = (varch, vmaj, vmin, vpatch)
 
@@ -101,7 +98,8 @@ def Require(env):
         if sys.platform != "win32":
             if not excons.GetArgument("use-c++11", 0, int):
                 excons.SetArgument("use-c++11", 1)
-            if not "-std=c++11" in " ".join(env["CXXFLAGS"]):
+            # Compiler default or any -std= flag already set may be recent enough
+            if not checks.Source(env, "#if __cplusplus < 201103L\n#error C++11 required\n#endif\nint main() { return 0; }\n"):
                 env.Append(CXXFLAGS=" -std=c++11")
 
     env.Append(LIBS=["ai"])
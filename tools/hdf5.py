@@ -24,8 +24,6 @@
 
 
 import os
-import re
-import io
 import sys
 import excons
 from excons.tools import zlib
@@ -33,9 +31,6 @@ from excons.tools import szip
 from excons.tools import threads
 
 
-ThreadSafe_exp = re.compile(r"^\s*#define\s+H5_HAVE_THREADSAFE\s+1")
-Szip_exp = re.compile(r"^\s*#define\s+H5_HAVE_SZLIB_H\s+1")
-Zlib_exp = re.compile(r"^\s*#define\s+H5_HAVE_ZLIB_H\s+1")
 hdf5_confs = {}
 
 def GetOptionsString():
@@ -101,21 +96,12 @@ def Require(hl=False, verbose=False):
                 if verbose:
                     excons.PrintOnce("Reading configuration header '%s'..." % h5conf, tool="hdf5")
 
-                with io.open(h5conf, "r", encoding="UTF-8", newline="\n") as f:
+                defs = excons.HeaderDefines(h5conf, ["H5_HAVE_THREADSAFE", "H5_HAVE_SZLIB_H", "H5_HAVE_ZLIB_H"])
+                cfg["threadsafe"] = (defs.get("H5_HAVE_THREADSAFE", None) == "1")
+                cfg["szip"] = (defs.get("H5_HAVE_SZLIB_H", None) == "1")
+                cfg["zlib"] = (defs.get("H5_HAVE_ZLIB_H", None) == "1")
 
-                    for l in f.readlines():
-                        l = l.strip()
-
-                        if ThreadSafe_exp.match(l):
-                            cfg["threadsafe"] = True
-
-                        elif Szip_exp.match(l):
-                            cfg["szip"] = True
-
-                        elif Zlib_exp.match(l):
-                            cfg["zlib"] = True
-
-                    hdf5_confs[h5conf] = cfg
+                hdf5_confs[h5conf] = cfg
 
             if not quiet:
                 if cfg["threadsafe"]:
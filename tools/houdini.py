@@ -26,10 +26,10 @@
 import SCons.Script # pylint: disable=import-error
 import excons
 import excons.devtoolset
+from excons import probecache
 import sys
 import re
 import os
-import subprocess
 
 
 _hou_mscver = {
@@ -169,60 +169,163 @@ def GetVersionAndDirectory(noexc=False):
 
     return (ver, hfs)
 
-def Require(env):
-    excons.AddHelpOptions(houdini=GetOptionsString())
+# Split flags on whitespaces, keeping quotes and escaped characters as is
+_FlagExp = re.compile(r"""(?:\\.|"(?:\\.|[^"\\])*"|'[^']*'|[^\s"'\\])+""")
 
-    ver, hfs = GetVersionAndDirectory(noexc=True)
-    if not ver or not hfs:
-        return
+def _Unquote(s):
+    if len(s) >= 2 and s[0] == s[-1] and s[0] in "\"'":
+        return s[1:-1]
+    return s
 
+def _ParseCompileFlags(flags):
+    rv = {"CPPDEFINES": [], "CPPPATH": [], "CXXFLAGS": []}
+    toks = _FlagExp.findall(flags)
+    i = 0
+    while i < len(toks):
+        tok = toks[i]
+        if tok[:2] in ("-D", "/D"):
+            d = tok[2:]
+            if not d and i + 1 < len(toks):
+                i += 1
+                d = toks[i]
+            # Keep value as is (quotes included) to get the same command line as hcustom's
+            if "=" in d:
+                name, value = d.split("=", 1)
+                rv["CPPDEFINES"].append((name, value))
+            else:
+                rv["CPPDEFINES"].append(d)
+        elif tok[:2] in ("-I", "/I"):
+            d = tok[2:]
+            if not d and i + 1 < len(toks):
+                i += 1
+                d = toks[i]
+            rv["CPPPATH"].append(_Unquote(d))
+        else:
+            rv["CXXFLAGS"].append(tok)
+        i += 1
+    return rv
+
+def _ParseLinkFlags(flags):
+    rv = {"LIBPATH": [], "LIBS": [], "LINKFLAGS": []}
+    toks = _FlagExp.findall(flags)
+    i = 0
+    while i < len(toks):
+        tok = toks[i]
+        if tok.startswith("-L") and sys.platform != "win32":
+            d = tok[2:]
+            if not d and i + 1 < len(toks):
+                i += 1
+                d = toks[i]
+            rv["LIBPATH"].append(_Unquote(d))
+        elif tok.startswith("-l") and sys.platform != "win32":
+            rv["LIBS"].append(tok[2:])
+        elif tok.upper()[1:9] == "LIBPATH:" and tok[0] in "-/":
+            rv["LIBPATH"].append(_Unquote(tok[9:]))
+        elif tok.lower().endswith(".lib") and sys.platform == "win32":
+            rv["LIBS"].append(_Unquote(tok))
+        elif tok == "-framework" and i + 1 < len(toks):
+            rv["LINKFLAGS"].extend([tok, toks[i+1]])
+            i += 1
+        else:
+            rv["LINKFLAGS"].append(tok)
+        i += 1
+    return rv
+
+_Flags = {}
+
+def GetFlags(env, ver, hfs):
     # Call hcustom -c, hcustom -m to setup compile and link flags
+    #   Results are parsed once per HFS and stored on disk until hcustom changes
 
-    hcustomenv = os.environ.copy()
-    hcustomenv["HFS"] = hfs
-    if sys.platform == "win32":
-        # Oldver version of hcustom on windows require MSVCDir to be set
-        cmntools = "VS%sCOMNTOOLS" % env["MSVC_VERSION"].replace(".", "")
-        if cmntools in hcustomenv:
-            cmntools = hcustomenv[cmntools]
-            if cmntools.endswith("\\") or cmntools.endswith("/"):
-                cmntools = cmntools[:-1]
-            cmntools = excons.joinpath(os.path.split(os.path.split(cmntools)[0])[0], "VC")
-            hcustomenv["MSVCDir"] = cmntools
+    mscver = (env["MSVC_VERSION"] if sys.platform == "win32" else "")
+    key = (hfs, ver, mscver)
+    rv = _Flags.get(key, None)
+    if rv is not None:
+        return rv
 
     hcustom = "%s/bin/hcustom" % hfs
+    if sys.platform == "win32" and not os.path.isfile(hcustom):
+        hcustom += ".exe"
+
+    hkey = probecache.FileKey(hcustom)
+    if hkey is not None:
+        rv = probecache.Get("houdini", "%s|%s|%s" % (hkey, ver, mscver))
 
-    cmd = "\"%s\" -c" % hcustom
-    p = subprocess.Popen(cmd, shell=True, env=hcustomenv, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    out, _ = p.communicate()
-    ccflags = out.decode("ascii").strip() if sys.version_info.major > 2 else out.strip()
-    if not "DLLEXPORT" in ccflags:
+    if rv is None:
+        hcustomenv = os.environ.copy()
+        hcustomenv["HFS"] = hfs
         if sys.platform == "win32":
-            ccflags += ' /DDLLEXPORT="__declspec(dllexport)"'
+            # Oldver version of hcustom on windows require MSVCDir to be set
+            cmntools = "VS%sCOMNTOOLS" % mscver.replace(".", "")
+            if cmntools in hcustomenv:
+                cmntools = hcustomenv[cmntools]
+                if cmntools.endswith("\\") or cmntools.endswith("/"):
+                    cmntools = cmntools[:-1]
+                cmntools = excons.joinpath(os.path.split(os.path.split(cmntools)[0])[0], "VC")
+                hcustomenv["MSVCDir"] = cmntools
+
+        (ccrc, ccflags), (linkrc, linkflags) = probecache.Spawn(["\"%s\" -c" % hcustom, "\"%s\" -m" % hcustom], env=hcustomenv)
+        # Don't keep results of a failed run (i.e. invalid HFS or license environment)
+        succeeded = (ccrc == 0 and linkrc == 0)
+        if not succeeded:
+            excons.WarnOnce("'%s' failed, compile and link flags may be incomplete." % hcustom, tool="houdini")
+        ccflags = ccflags.strip()
+        linkflags = linkflags.strip()
+
+        if not "DLLEXPORT" in ccflags:
+            if sys.platform == "win32":
+                ccflags += ' /DDLLEXPORT="__declspec(dllexport)"'
+            else:
+                ccflags += ' -DDLLEXPORT='
+        if sys.platform != "win32":
+            if int(ver.split(".")[0]) >= 14:
+                if not "-std=c++11" in ccflags:
+                    ccflags += ' -DBOOST_NO_DEFAULTED_FUNCTIONS -DBOOST_NO_DELETED_FUNCTIONS'
+
+        if sys.platform == "win32":
+            linkflags = re.sub(r"-link\s+", "", linkflags)
+        elif sys.platform != "darwin":
+            # On linux, $HFS/dsolib doesn't seem appear in linkflags
+            linkflags += " -L %s/dsolib" % hfs
         else:
-            ccflags += ' -DDLLEXPORT='
-    if sys.platform != "win32":
-        if int(ver.split(".")[0]) >= 14:
-            if not "-std=c++11" in ccflags:
-                ccflags += ' -DBOOST_NO_DEFAULTED_FUNCTIONS -DBOOST_NO_DELETED_FUNCTIONS'
-
-    cmd = "\"%s\" -m" % hcustom
-    p = subprocess.Popen(cmd, shell=True, env=hcustomenv, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    out, _ = p.communicate()
-    linkflags = out.decode("ascii").strip() if sys.version_info.major > 2 else out.strip()
-    if sys.platform == "win32":
-        linkflags = re.sub(r"-link\s+", "", linkflags)
-    elif sys.platform != "darwin":
-        # On linux, $HFS/dsolib doesn't seem appear in linkflags
-        linkflags += " -L %s/dsolib" % hfs
-    else:
-        # On OSX, linkflags does not provide frameworks or libraries to link
-        libs = [
-            "HoudiniUI", "HoudiniOPZ", "HoudiniOP3", "HoudiniOP2", "HoudiniOP1",
-            "HoudiniSIM", "HoudiniGEO", "HoudiniPRM", "HoudiniUT"]
+            # On OSX, linkflags does not provide frameworks or libraries to link
+            libs = [
+                "HoudiniUI", "HoudiniOPZ", "HoudiniOP3", "HoudiniOP2", "HoudiniOP1",
+                "HoudiniSIM", "HoudiniGEO", "HoudiniPRM", "HoudiniUT"]
+
+            libdir = "%s/Libraries" % "/".join(hfs.split("/")[:-1])
+            linkflags += " -flat_namespace -L %s -l%s" % (libdir, " -l".join(libs))
+
+        rv = _ParseCompileFlags(ccflags)
+        rv.update(_ParseLinkFlags(linkflags))
+
+        if hkey is not None and succeeded:
+            probecache.Set("houdini", "%s|%s|%s" % (hkey, ver, mscver), rv)
+
+    # JSON has no tuples (copy: rv may be shared with the probe cache)
+    rv = dict(rv)
+    rv["CPPDEFINES"] = [(tuple(x) if isinstance(x, list) else x) for x in rv["CPPDEFINES"]]
+
+    _Flags[key] = rv
+
+    return rv
+
+def Require(env):
+    excons.AddHelpOptions(houdini=GetOptionsString())
+
+    ver, hfs = GetVersionAndDirectory(noexc=True)
+    if not ver or not hfs:
+        return
 
-        libdir = "%s/Libraries" % "/".join(hfs.split("/")[:-1])
-        linkflags += " -flat_namespace -L %s -l%s" % (libdir, " -l".join(libs))
+    flags = GetFlags(env, ver, hfs)
 
-    env.Append(CXXFLAGS=" %s" % ccflags)
-    env.Append(LINKFLAGS=" %s" % linkflags)
+    # Structured flags let SCons remove duplicates (i.e. with other tools)
+    env.AppendUnique(CPPDEFINES=flags["CPPDEFINES"][:])
+    env.AppendUnique(CPPPATH=flags["CPPPATH"][:])
+    env.AppendUnique(LIBPATH=flags["LIBPATH"][:])
+    env.AppendUnique(LIBS=flags["LIBS"][:])
+    # Unstructured flags may go by pairs (i.e. -framework <name>): only add them once
+    if env.get("HOUDINI_HFS", None) != hfs:
+        env["HOUDINI_HFS"] = hfs
+        env.Append(CXXFLAGS=flags["CXXFLAGS"][:])
+        env.Append(LINKFLAGS=flags["LINKFLAGS"][:])
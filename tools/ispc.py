@@ -0,0 +1,162 @@
+# MIT License
+#
+# Copyright (c) 2009 Gaetan Guidet
+#
+# This file is part of excons.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import os
+import sys
+import excons
+import SCons.Builder # pylint: disable=import-error
+import SCons.Defaults # pylint: disable=import-error
+import SCons.Tool # pylint: disable=import-error
+import SCons.Scanner.C # pylint: disable=import-error
+import SCons.Script # pylint: disable=import-error
+
+
+DefaultTargets = "sse4-i32x4,avx2-i32x8,avx512skx-x16"
+
+# Target ISA prefix -> suffix used by ispc for per-target object files
+_ISANames = {"sse2": "sse2",
+             "sse4": "sse4",
+             "sse4.1": "sse4",
+             "sse4.2": "sse4",
+             "avx1": "avx",
+             "avx2": "avx2",
+             "avx512knl": "avx512knl",
+             "avx512skx": "avx512skx",
+             "avx512spr": "avx512spr"}
+
+def GetOptionsString():
+    return """ISPC OPTIONS
+  with-ispc=<path>     : ISPC root directory.
+  ispc-targets=<str>   : Comma separated list of ISPC targets.  [%s]
+                         When several targets are specified, a dispatcher selects
+                         the best one at runtime.
+  ispc-flags=<str>     : Additional ISPC compiler flags.        []""" % DefaultTargets
+
+def Executable():
+    _, bindir = excons.GetDirs("ispc", libdirname="bin", silent=True)
+    if bindir:
+        path = bindir + "/ispc" + (".exe" if sys.platform == "win32" else "")
+        if os.path.isfile(path):
+            return path
+    return excons.Which("ispc$")
+
+def Targets():
+    return [x.strip() for x in excons.GetArgument("ispc-targets", DefaultTargets).split(",") if x.strip()]
+
+def HeaderDirectory():
+    # Generated headers for all targets go to a single directory added to CPPPATH
+    return excons.joinpath(excons.BuildBaseDirectory(), "ispc", "include")
+
+def Header(src):
+    return excons.joinpath(HeaderDirectory(), os.path.splitext(os.path.basename(str(src)))[0] + "_ispc.h")
+
+def Headers(srcs):
+    return [Header(x) for x in srcs if str(x).endswith(".ispc")]
+
+def SrcDeps(srcs):
+    # Explicit dependencies of C/C++ sources on the headers generated from ISPC sources,
+    #   to be used as target 'srcdeps' when includes can't be found by SCons' scanner
+    hdrs = Headers(srcs)
+    return dict([(str(x), hdrs) for x in srcs if not str(x).endswith(".ispc")])
+
+def _Emitter(target, source, env):
+    # The header doesn't depend on object type (static or shared): generate it separately
+    #   and only once so that a source shared by several targets doesn't yield conflicting actions
+    hdr = env.File(Header(source[0]))
+    if not hdr.has_builder():
+        env.ISPCHeader(hdr, source[0])
+    # ispc writes <obj>_<isa>.<ext> for each target when compiling for several of them
+    base, ext = os.path.splitext(str(target[0]))
+    isas = env["ISPCTARGETS"]
+    if len(isas) > 1:
+        for isa in isas:
+            isa = isa.split("-")[0]
+            target.append(env.File("%s_%s%s" % (base, _ISANames.get(isa, isa), ext)))
+    return target, source
+
+def _StaticEmitter(target, source, env):
+    target, source = _Emitter(target, source, env)
+    return SCons.Defaults.StaticObjectEmitter(target, source, env)
+
+def _SharedEmitter(target, source, env):
+    target, source = _Emitter(target, source, env)
+    return SCons.Defaults.SharedObjectEmitter(target, source, env)
+
+def _ObjectBuilder(env, name, action, emitter):
+    # Object builders are shared by all environments cloned from the same one:
+    #   use a copy so that .ispc sources are only handled by environments requiring ispc
+    bld = SCons.Tool.createObjBuilders(env)[0 if name == "StaticObject" else 1]
+    actions = dict(bld.cmdgen)
+    actions[".ispc"] = action
+    emitters = dict(bld.builder.emitter)
+    emitters[".ispc"] = emitter
+    return SCons.Builder.Builder(action=actions,
+                                 emitter=emitters,
+                                 prefix=bld.builder.prefix,
+                                 suffix=bld.builder.suffix,
+                                 src_builder=bld.builder.src_builder,
+                                 source_scanner=bld.builder.source_scanner,
+                                 single_source=1)
+
+def Require(env):
+    ispc = Executable()
+    if ispc is None:
+        excons.WarnOnce("Could not find 'ispc' executable (use with-ispc= flag).", tool="ispc")
+        return
+
+    env["ISPC"] = ispc
+    env["ISPCTARGETS"] = Targets()
+    env["ISPCFLAGS"] = excons.GetArgument("ispc-flags", "")
+    if excons.GetArgument("debug", 0, int):
+        env.Append(ISPCFLAGS=" -O0 -g")
+    else:
+        env.Append(ISPCFLAGS=" -O2")
+        if excons.GetArgument("with-debug-info", 0, int):
+            env.Append(ISPCFLAGS=" -g")
+    env["ISPCARCH"] = ("x86" if excons.arch_dir == "x86" else "x86-64")
+
+    cmd = "$ISPC $ISPCFLAGS --arch=$ISPCARCH --target=${','.join(ISPCTARGETS)} $_CPPDEFFLAGS $_CPPINCFLAGS -o $TARGET $SOURCE"
+    env["ISPCCOM"] = cmd
+    env["SHISPCCOM"] = cmd.replace("$ISPCFLAGS", "$ISPCFLAGS --pic")
+    env["ISPCCOMSTR"] = "$PROGRESS Compiling (static) $SOURCE ..."
+    env["SHISPCCOMSTR"] = "$PROGRESS Compiling (shared) $SOURCE ..."
+    env["ISPCHCOM"] = "$ISPC --arch=$ISPCARCH --target=${','.join(ISPCTARGETS)} $_CPPDEFFLAGS $_CPPINCFLAGS -h $TARGET $SOURCE"
+    env["ISPCHCOMSTR"] = "Generating $TARGET ..."
+    env["BUILDERS"]["ISPCHeader"] = SCons.Script.Builder(action=SCons.Script.Action("$ISPCHCOM", "$ISPCHCOMSTR"))
+
+    # Let DeclareTargets 'srcs' handle .ispc files like any other source
+    static_obj = _ObjectBuilder(env, "StaticObject", SCons.Script.Action("$ISPCCOM", "$ISPCCOMSTR"), _StaticEmitter)
+    shared_obj = _ObjectBuilder(env, "SharedObject", SCons.Script.Action("$SHISPCCOM", "$SHISPCCOMSTR"), _SharedEmitter)
+    env["BUILDERS"]["StaticObject"] = static_obj
+    env["BUILDERS"]["Object"] = static_obj
+    env["BUILDERS"]["SharedObject"] = shared_obj
+
+    # ISPC uses C preprocessor
+    SCons.Tool.SourceFileScanner.add_scanner(".ispc", SCons.Scanner.C.CScanner())
+
+    env.Append(CPPPATH=[HeaderDirectory()])
+
+    excons.AddHelpOptions(ispc=GetOptionsString())
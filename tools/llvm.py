@@ -26,7 +26,7 @@
 import os
 import sys
 import excons
-import subprocess
+from excons import probecache
 
 
 def _CleanList(lst):
@@ -68,131 +68,190 @@ def _IsIncludeFlag(x):
 # ===---
 
 llvm_cfg = None
+llvm_cfgs = {}
+
+def LinkMode():
+    # Static by default: shared library adds an absolute rpath to the LLVM install
+    mode = excons.GetArgument("llvm-link", "static")
+    if mode not in ("static", "shared", "auto"):
+        excons.WarnOnce("Invalid 'llvm-link' value '%s', use 'static'." % mode, tool="llvm")
+        mode = "static"
+    return mode
+
+def _ComponentsString(components):
+    if not components:
+        return ""
+    elif isinstance(components, excons.anystring):
+        return " %s" % components
+    elif isinstance(components, (tuple, list, set)):
+        return " %s" % " ".join(components)
+    else:
+        excons.WarnOnce("'components' should either be a string or a list of strings.", tool="llvm")
+        return ""
+
+def _ProbeLLVMConfig(llvm_config, comps):
+    # All queries at once, results are sorted out by caller
+    queries = {"version": "--version",
+               "cppflags": "--cppflags",
+               "cxxflags": "--cxxflags",
+               "libdir": "--libdir",
+               "shared_libs": "--link-shared --libs%s" % comps,
+               "shared_syslibs": "--link-shared --system-libs%s" % comps,
+               "static_libs": "--link-static --libs%s" % comps,
+               "static_syslibs": "--link-static --system-libs%s" % comps,
+               "libs": "--libs%s" % comps,
+               "syslibs": "--system-libs"}
+    names = sorted(queries.keys())
+    outs = probecache.Spawn(["\"%s\" %s" % (llvm_config, queries[x]) for x in names])
+    return dict([(names[i], [outs[i][0], outs[i][1].strip()]) for i in excons.xrange(len(names))])
+
+def _ParseLibs(out):
+    libs = []
+    for l in out.split("\n"):
+        if sys.platform == "win32":
+            lst = [_LibName(x) for x in _FlagsToList(l)]
+        else:
+            # Note: system libraries may be given as full path (i.e. /usr/lib/x86_64-linux-gnu/libz3.so)
+            lst = [(x[2:] if x.startswith("-l") else x) for x in _FlagsToList(l)]
+        libs.extend(lst)
+    return libs
 
 def GetLLVMConfig(components=None):
     global llvm_cfg # pylint: disable=global-statement
 
-    if llvm_cfg is None:
-        exesuffix = ("" if sys.platform != "win32" else ".exe")
+    exesuffix = ("" if sys.platform != "win32" else ".exe")
+
+    llvm_incdir, llvm_libdir = excons.GetDirs("llvm", silent=False)
 
-        llvm_incdir, llvm_libdir = excons.GetDirs("llvm", silent=False)
+    llvm_config = None
 
-        llvm_config = None
+    if llvm_incdir:
+        path = os.path.dirname(llvm_incdir) + "/bin/llvm-config" + exesuffix
+        if os.path.isfile(path):
+            llvm_config = path
 
-        if llvm_incdir:
-            path = os.path.dirname(llvm_incdir) + "/bin/llvm-config" + exesuffix
+    if llvm_config is None:
+        if llvm_libdir:
+            path = os.path.dirname(llvm_libdir) + "/bin/llvm-config" + exesuffix
             if os.path.isfile(path):
                 llvm_config = path
 
-        if llvm_config is None:
-            if llvm_libdir:
-                path = os.path.dirname(llvm_libdir) + "/bin/llvm-config" + exesuffix
-                if os.path.isfile(path):
-                    llvm_config = path
-
-        if llvm_config is None:
-            for d in os.environ["PATH"].split(os.pathsep):
-                path = d + "/llvm-config" + exesuffix
-                if os.path.isfile(path):
-                    llvm_config = path
-                    break
-
-        if llvm_config is None:
-            excons.WarnOnce("Could not find 'llvm-config'", tool="llvm")
-            sys.exit(1)
-
-        excons.PrintOnce("Use '%s'" % llvm_config, tool="llvm")
+    if llvm_config is None:
+        for d in os.environ["PATH"].split(os.pathsep):
+            path = d + "/llvm-config" + exesuffix
+            if os.path.isfile(path):
+                llvm_config = path
+                break
 
-        llvm_cfg = {}
-        procargs = {"shell": True, "stdout": subprocess.PIPE, "stderr": subprocess.STDOUT}
+    if llvm_config is None:
+        excons.WarnOnce("Could not find 'llvm-config'", tool="llvm")
+        sys.exit(1)
 
-        if llvm_incdir:
-            llvm_cfg["incdir"] = llvm_incdir
+    comps = _ComponentsString(components)
+    linkmode = LinkMode()
+
+    # One configuration per set of components
+    cfgkey = (llvm_config, comps, linkmode, llvm_incdir, llvm_libdir)
+    if cfgkey in llvm_cfgs:
+        llvm_cfg = llvm_cfgs[cfgkey]
+        return llvm_cfg
+
+    excons.PrintOnce("Use '%s'" % llvm_config, tool="llvm")
+
+    # llvm-config path, modification time and components: a new LLVM install invalidates results
+    probekey = "%s|%s" % (probecache.FileKey(llvm_config), comps)
+    probes = probecache.Get("llvm", probekey)
+    if probes is None:
+        probes = _ProbeLLVMConfig(llvm_config, comps)
+        # Don't keep results of a llvm-config that couldn't run (i.e. shared libraries not found)
+        if probes["version"][0] == 0:
+            probecache.Set("llvm", probekey, probes)
+
+    def _Output(name, warn=True):
+        rc, out = probes[name]
+        if rc != 0:
+            if warn:
+                excons.WarnOnce("'%s' query failed." % name, tool="llvm")
+            return None
+        return out
+
+    llvm_cfg = {}
+
+    if llvm_incdir:
+        llvm_cfg["incdir"] = llvm_incdir
+
+    if llvm_libdir:
+        llvm_cfg["libdir"] = llvm_libdir
+
+    out = _Output("version")
+    if out is not None:
+        llvm_cfg["version_str"] = out
+        spl = out.split(".")
+        llvm_cfg["version_major"] = int(spl[0])
+        llvm_cfg["version_minor"] = int(spl[1])
+    else:
+        llvm_cfg["verison_str"] = ""
+        llvm_cfg["verison_major"] = 0
+        llvm_cfg["verison_minor"] = 0
 
-        if llvm_libdir:
-            llvm_cfg["libdir"] = llvm_libdir
-
-        cmd = "%s --version" % llvm_config
-        p = subprocess.Popen(cmd, **procargs)
-        out, _ = p.communicate()
-        if p.returncode == 0:
-            llvm_cfg["version_str"] = out.decode("ascii").strip() if sys.version_info.major > 2 else out.strip()
-            spl = llvm_cfg["version_str"].split(".")
-            llvm_cfg["version_major"] = int(spl[0])
-            llvm_cfg["version_minor"] = int(spl[1])
-        else:
-            excons.WarnOnce("'%s' command failed." % cmd, tool="llvm")
-            llvm_cfg["verison_str"] = ""
-            llvm_cfg["verison_major"] = 0
-            llvm_cfg["verison_minor"] = 0
-
-        cmd = "%s --cppflags" % llvm_config
-        p = subprocess.Popen(cmd, **procargs)
-        out, _ = p.communicate()
-        if p.returncode == 0:
-            cppflags = out.decode("ascii").strip() if sys.version_info.major > 2 else out.strip()
-            llvm_cfg["cppflags"] = " " + " ".join(filter(lambda x: not _IsIncludeFlag(x), _FlagsToList(cppflags)))
-        else:
-            excons.WarnOnce("'%s' command failed." % cmd, tool="llvm")
-            llvm_cfg["cppflags"] = ""
-
-        cmd = "%s --cxxflags" % llvm_config
-        p = subprocess.Popen(cmd, **procargs)
-        out, _ = p.communicate()
-        if p.returncode == 0:
-            cxxflags = _FlagsToList(out.decode("ascii").strip() if sys.version_info.major > 2 else out.strip())
-            if sys.platform != "win32":
-                llvm_cfg["rtti"] = (not "-fno-rtti" in cxxflags)
-                llvm_cfg["exceptions"] = (not "-fno-exceptions" in cxxflags)
-            else:
-                llvm_cfg["rtti"] = (not "/GR-" in cxxflags)
-                llvm_cfg["exceptions"] = (not "/EHs-c-" in cxxflags)
-        else:
-            excons.WarnOnce("'%s' command failed." % cmd, tool="llvm")
-
-        cmd = "%s --libs" % llvm_config
-        if components:
-            if isinstance(components, excons.anystring):
-                cmd += " %s" % components
-            elif isinstance(components, (tuple, list, set)):
-                cmd += " %s" % " ".join(components)
-            else:
-                excons.WarnOnce("'components' should either be a string or a list of strings.", tool="llvm")
-        p = subprocess.Popen(cmd, **procargs)
-        out, _ = p.communicate()
-        if p.returncode == 0:
-            libs = []
-            out_dcd = out.decode("ascii").split("\n") if sys.version_info.major > 2 else out.split("\n")
-            for l in out_dcd:
-                lst = [_LibName(x) for x in (_FlagsToList(l) if sys.platform == "win32" else _CleanList(l.split("-l")))]
-                libs.extend(lst)
-            llvm_cfg["libs"] = libs
-        else:
-            excons.WarnOnce("'%s' command failed." % cmd, tool="llvm")
-            llvm_cfg["libs"] = []
-
-        cmd = "%s --system-libs" % llvm_config
-        p = subprocess.Popen(cmd, **procargs)
-        out, _ = p.communicate()
-        if p.returncode == 0:
-            libs = []
-            out_dcd = out.decode("ascii").split("\n") if sys.version_info.major > 2 else out.split("\n")
-            for l in out_dcd:
-                lst = [_LibName(x) for x in (_FlagsToList(l) if sys.platform == "win32" else _CleanList(l.split("-l")))]
-                libs.extend(lst)
-            llvm_cfg["syslibs"] = libs
+    out = _Output("cppflags")
+    if out is not None:
+        llvm_cfg["cppflags"] = " " + " ".join(filter(lambda x: not _IsIncludeFlag(x), _FlagsToList(out)))
+    else:
+        llvm_cfg["cppflags"] = ""
+
+    out = _Output("cxxflags")
+    if out is not None:
+        cxxflags = _FlagsToList(out)
+        if sys.platform != "win32":
+            llvm_cfg["rtti"] = (not "-fno-rtti" in cxxflags)
+            llvm_cfg["exceptions"] = (not "-fno-exceptions" in cxxflags)
         else:
-            excons.WarnOnce("'%s' command failed." % cmd, tool="llvm")
-            llvm_cfg["syslibs"] = []
+            llvm_cfg["rtti"] = (not "/GR-" in cxxflags)
+            llvm_cfg["exceptions"] = (not "/EHs-c-" in cxxflags)
+
+    llvm_cfg["shared"] = False
+    if linkmode != "static":
+        # Single libLLVM-<ver> shared library rather than per-component static archives
+        #   Note: llvm-config fails when the shared library wasn't built (or prior to LLVM 3.9)
+        out = _Output("shared_libs", warn=False)
+        if out:
+            llvm_cfg["shared"] = True
+            llvm_cfg["libs"] = _ParseLibs(out)
+            llvm_cfg["syslibs"] = _ParseLibs(_Output("shared_syslibs", warn=False) or "")
+            if not "libdir" in llvm_cfg:
+                out = _Output("libdir")
+                if out:
+                    llvm_cfg["libdir"] = out
+        elif linkmode == "shared":
+            excons.WarnOnce("LLVM shared library not available, link static libraries.", tool="llvm")
+
+    if not llvm_cfg["shared"]:
+        # LLVM builds configured to link tools against libLLVM default to shared libraries
+        out = _Output("static_libs", warn=False)
+        if out is None:
+            out = _Output("libs")
+        llvm_cfg["libs"] = _ParseLibs(out or "")
+
+        out = _Output("static_syslibs", warn=False)
+        if out is None:
+            out = _Output("syslibs")
+        llvm_cfg["syslibs"] = _ParseLibs(out or "")
+
+    llvm_cfgs[cfgkey] = llvm_cfg
 
     return llvm_cfg
 
-
 def GetOptionsString():
     return """LLVM OPTIONS
   with-llvm=<path>     : LLVM prefix                []
   with-llvm-inc=<path> : LLVM headers directory     [<prefix>/include]
-  with-llvm-lib=<path> : LLVM libraries directory   [<prefix>/lib]"""
+  with-llvm-lib=<path> : LLVM libraries directory   [<prefix>/lib]
+  llvm-link=<str>      : LLVM libraries link mode   [static]
+                         'static' links per-component static libraries (i.e. for packaging),
+                         'shared' links libLLVM shared library, 'auto' uses the shared
+                         library when available. 'shared' and 'auto' add the LLVM
+                         libraries directory to rpath: outputs are not relocatable."""
 
 def Require(min_version=None, require_rtti=False, require_exceptions=False, components=None):
     cfg = GetLLVMConfig(components)
@@ -231,9 +290,16 @@ def Require(min_version=None, require_rtti=False, require_exceptions=False, comp
             env.Append(CPPPATH=[cfg["incdir"]])
         if "libdir" in cfg:
             env.Append(LIBPATH=[cfg["libdir"]])
-        for lib in cfg["libs"]:
-            excons.Link(env, lib, static=True, force=True, silent=False)
-        env.Append(LIBS=cfg["syslibs"])
+        if cfg["shared"]:
+            for lib in cfg["libs"]:
+                excons.Link(env, lib, static=False, force=True, silent=False)
+            if "libdir" in cfg:
+                # Absolute path, libLLVM is not installed alongside targets
+                env.Append(RPATHS=[cfg["libdir"]])
+        else:
+            for lib in cfg["libs"]:
+                excons.Link(env, lib, static=True, force=True, silent=False)
+        env.Append(LIBS=[(env.File(x) if os.path.isabs(x) else x) for x in cfg["syslibs"]])
 
         excons.AddHelpOptions(llvm=GetOptionsString())
 
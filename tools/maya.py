@@ -28,7 +28,6 @@ import excons
 import excons.devtoolset
 import sys
 import re
-import io
 import os
 
 
@@ -208,27 +207,23 @@ def Version(asString=True, nice=False):
 
     mtypes = excons.joinpath(mayainc, "maya", "MTypes.h")
 
-    if os.path.isfile(mtypes):
-        defexp = re.compile(r"^\s*#define\s+MAYA_API_VERSION\s+([0-9]+)")
-        f = io.open(mtypes, "r", encoding="UTF-8", newline="\n")
-        for line in f.readlines():
-            m = defexp.match(line)
-            if m:
-                year = int(m.group(1)[:4])
-                sub = int(m.group(1)[4])
-                if wantedver is not None:
-                    usever = "%d%s" % (year, ".5" if sub >= 5 else "")
-                    if usever != wantedver:
-                        excons.WarnOnce("Maya headers version (%s) doesn't seem to match requested one (%s).\nMake sure to set or reset devkit path using 'with-mayadevkit=' flag." % (usever, wantedver))
-                if nice:
-                    # Maya 2013 and 2016 have a binary incompatible .5 version
-                    if sub >= 5 and year in (2013, 2016):
-                        return (year+0.5 if not asString else "%d.5" % year)
-                    else:
-                        return (year if not asString else str(year))
-                else:
-                    return (int(m.group(1)) if not asString else m.group(1))
-        f.close()
+    apiver = excons.HeaderDefines(mtypes, "MAYA_API_VERSION").get("MAYA_API_VERSION", "")
+    m = re.match(r"^([0-9]+)", apiver)
+    if m:
+        year = int(m.group(1)[:4])
+        sub = int(m.group(1)[4])
+        if wantedver is not None:
+            usever = "%d%s" % (year, ".5" if sub >= 5 else "")
+            if usever != wantedver:
+                excons.WarnOnce("Maya headers version (%s) doesn't seem to match requested one (%s).\nMake sure to set or reset devkit path using 'with-mayadevkit=' flag." % (usever, wantedver))
+        if nice:
+            # Maya 2013 and 2016 have a binary incompatible .5 version
+            if sub >= 5 and year in (2013, 2016):
+                return (year+0.5 if not asString else "%d.5" % year)
+            else:
+                return (year if not asString else str(year))
+        else:
+            return (int(m.group(1)) if not asString else m.group(1))
 
     excons.WarnOnce("Cannot find maya headers (missing with-mayadevkit= ?).")
     return (None if not asString else "")
@@ -28,7 +28,6 @@ import excons
 import sys
 import re
 import os
-import io
 
 
 def GetOptionsString():
@@ -50,19 +49,17 @@ def Version(asString=True, compat=False):
     if mtoa_inc and mtoa_lib:
         versionh = excons.joinpath(mtoa_inc, "utils", "Version.h")
         varch, vmaj, vmin = 0, 0, 0
-        if os.path.isfile(versionh):
-            defexp = re.compile(r"^\s*#define\s+MTOA_(ARCH|MAJOR|MINOR)_VERSION_NUM\s+([^\s]+)")
-            with io.open(versionh, "r", encoding="UTF-8", newline="\n") as f:
-                for line in f.readlines():
-                    m = defexp.match(line)
-                    if m:
-                        which = m.group(1)
-                        if which == "ARCH":
-                            varch = int(m.group(2))
-                        elif which == "MAJOR":
-                            vmaj = int(m.group(2))
-                        elif which == "MINOR":
-                            vmin = int(m.group(2))
+        defs = excons.HeaderDefines(versionh, ["MTOA_ARCH_VERSION_NUM", "MTOA_MAJOR_VERSION_NUM", "MTOA_MINOR_VERSION_NUM"])
+        for which, val in defs.items():
+            m = re.match(r"^\d+", val)
+            if m is None:
+                continue
+            if which == "MTOA_ARCH_VERSION_NUM":
+                varch = int(m.group(0))
+            elif which == "MTOA_MAJOR_VERSION_NUM":
+                vmaj = int(m.group(0))
+            elif which == "MTOA_MINOR_VERSION_NUM":
+                vmin = int(m.group(0))
         if compat:
             rv = (varch, vmaj)
             return ("%s.%s" % rv if asString else rv)
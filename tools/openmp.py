@@ -0,0 +1,180 @@
+# MIT License
+#
+# Copyright (c) 2009 Gaetan Guidet
+#
+# This file is part of excons.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import os
+import re
+import sys
+import glob
+import excons
+import SCons.Script # pylint: disable=import-error
+
+
+# OpenMP runtime name -> library name
+Runtimes = {"gomp": "gomp",
+            "omp": "omp",
+            "iomp5": "iomp5"}
+
+# OpenMP runtime library file names
+_RuntimeExp = re.compile(r"^(lib)?(gomp|omp|iomp5|libiomp5md)(\.so(\.\d+)*|\.dylib|\.lib|\.dll)$")
+
+def GetOptionsString():
+    return """OPENMP OPTIONS
+  with-openmp=<path>      : OpenMP runtime root directory (for libomp or Intel's libiomp5).
+  with-openmp-inc=<path>  : OpenMP runtime headers directory.          [<root>/include]
+  with-openmp-lib=<path>  : OpenMP runtime libraries directory.        [<root>/lib]
+  openmp-runtime=<str>    : OpenMP runtime library to link.            [auto]
+                            One of 'auto', 'gomp' (libgomp), 'omp' (LLVM's libomp) or
+                            'iomp5' (Intel's libiomp5). 'auto' picks the runtime already
+                            used by the build environment (i.e. Maya or Houdini libraries)
+                            or the compiler default.
+  openmp-threads=<int>    : OMP_NUM_THREADS for commands run by SCons. []
+  openmp-proc-bind=<str>  : OMP_PROC_BIND for commands run by SCons.   [close]
+  openmp-places=<str>     : OMP_PLACES for commands run by SCons.      [cores]"""
+
+def Flavor(env):
+    # Compiler flavor as setup by excons: 'msvc', 'intel', 'appleclang', 'clang' or 'gcc'
+    if str(SCons.Script.Platform()) == "win32":
+        return "msvc"
+    cc = os.path.basename(env.subst("$CC"))
+    if cc.startswith("icc") or cc.startswith("icx"):
+        return "intel"
+    if sys.platform == "darwin":
+        return "appleclang"
+    if excons.IsClang(env):
+        return "clang"
+    return "gcc"
+
+def LibraryDirectories(env):
+    dirs = [env.subst(str(x)) for x in env.get("LIBPATH", [])]
+    flags = env.subst("$LINKFLAGS").split()
+    for i, flag in enumerate(flags):
+        if flag == "-L" and i + 1 < len(flags):
+            dirs.append(flags[i + 1])
+        elif flag.startswith("-L") and len(flag) > 2:
+            dirs.append(flag[2:])
+    return [x for x in dirs if x and os.path.isdir(x)]
+
+def HostRuntimes(env):
+    # OpenMP runtimes brought in by the environment (houdini and maya tools add their
+    #   libraries directories, which ship their own runtime, to LIBPATH or LINKFLAGS)
+    found = set()
+    for dn in LibraryDirectories(env):
+        for path in glob.glob(os.path.join(dn, "*omp*")):
+            m = _RuntimeExp.match(os.path.basename(path))
+            if m:
+                found.add("iomp5" if m.group(2) == "libiomp5md" else m.group(2))
+    for lib in env.get("LIBS", []):
+        lib = str(lib)
+        if lib in Runtimes.values():
+            found.add(lib)
+    return found
+
+def DefaultRuntime(flavor):
+    return {"msvc": "vcomp",
+            "intel": "iomp5",
+            "appleclang": "omp",
+            "clang": "omp"}.get(flavor, "gomp")
+
+def Runtime(env, flavor=None):
+    if flavor is None:
+        flavor = Flavor(env)
+
+    rt = excons.GetArgument("openmp-runtime", "auto")
+    if rt != "auto" and rt not in Runtimes:
+        excons.WarnOnce("Invalid 'openmp-runtime' value '%s', use 'auto'." % rt, tool="openmp")
+        rt = "auto"
+
+    host = HostRuntimes(env)
+    if rt == "auto":
+        if len(host) == 1:
+            rt = list(host)[0]
+        else:
+            rt = DefaultRuntime(flavor)
+    if host and rt not in host:
+        # Two runtimes in the same process oversubscribe cores at best, and crash at worst
+        excons.WarnOnce("Linking '%s' OpenMP runtime in an environment providing '%s'" % (rt, "', '".join(sorted(host))), tool="openmp")
+
+    if flavor == "msvc" and rt != "vcomp":
+        excons.WarnOnce("'openmp-runtime' ignored with msvc, use 'vcomp'.", tool="openmp")
+        rt = "vcomp"
+    elif flavor == "appleclang" and rt == "gomp":
+        excons.WarnOnce("libgomp not supported with Apple clang, use 'omp'.", tool="openmp")
+        rt = "omp"
+
+    return rt
+
+def TestEnvironment():
+    # Thread affinity defaults for test and training runs, user environment takes precedence
+    rv = {}
+    threads = excons.GetArgument("openmp-threads", 0, int)
+    if threads > 0:
+        rv["OMP_NUM_THREADS"] = str(threads)
+    rv["OMP_PROC_BIND"] = excons.GetArgument("openmp-proc-bind", "close")
+    rv["OMP_PLACES"] = excons.GetArgument("openmp-places", "cores")
+    for k in list(rv.keys()):
+        if k in os.environ or not rv[k]:
+            del rv[k]
+    return rv
+
+def Require(env):
+    flavor = Flavor(env)
+    rt = Runtime(env, flavor)
+
+    if flavor == "msvc":
+        env.Append(CCFLAGS=["/openmp"])
+
+    elif flavor == "intel":
+        env.Append(CCFLAGS=["-qopenmp"])
+        env.Append(LINKFLAGS=["-qopenmp"])
+
+    else:
+        ompinc, omplib = excons.GetDirs("openmp", silent=True)
+        if ompinc:
+            env.Append(CPPPATH=[ompinc])
+        if omplib:
+            env.Append(LIBPATH=[omplib])
+
+        if flavor == "appleclang":
+            # Apple clang doesn't ship an OpenMP runtime, let the preprocessor handle pragmas only
+            env.Append(CCFLAGS=["-Xpreprocessor", "-fopenmp"])
+            excons.Link(env, Runtimes[rt], static=False, force=True, silent=True)
+
+        elif flavor == "clang":
+            env.Append(CCFLAGS=["-fopenmp=lib%s" % Runtimes[rt]])
+            env.Append(LINKFLAGS=["-fopenmp=lib%s" % Runtimes[rt]])
+
+        else:
+            env.Append(CCFLAGS=["-fopenmp"])
+            if rt == "gomp":
+                env.Append(LINKFLAGS=["-fopenmp"])
+            else:
+                # libomp and libiomp5 also implement GOMP_* entry points used by gcc
+                excons.Link(env, Runtimes[rt], static=False, force=True, silent=True)
+                env.Append(LIBS=["pthread"])
+
+    env["ENV"].update(TestEnvironment())
+
+    excons.AddHelpOptions(openmp=GetOptionsString())
@@ -0,0 +1,408 @@
+# MIT License
+#
+# Copyright (c) 2009 Gaetan Guidet
+#
+# This file is part of excons.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Resolve dependencies from pkg-config '.pc' files without running pkg-config
+#
+#   from excons.tools import pkgconfig
+#   excons.Call(..., custom=[pkgconfig.Require("glib-2.0 >= 2.56, gio-2.0")])
+#
+# Parsed files are kept in the probe cache (see probecache.py) keyed by path, modification time and size.
+
+
+import os
+import re
+import sys
+import io
+import shlex
+import platform
+import sysconfig
+import excons
+from excons import probecache
+
+# pylint: disable=bare-except
+
+
+_VarExp = re.compile(r"\$\{([^}]+)\}")
+_VerExp = re.compile(r"(\d+|[a-zA-Z]+)")
+_ReqExp = re.compile(r"[<>=!]=?|[^\s,<>=!]+")
+_Ops = ("<", "<=", "=", "!=", ">=", ">")
+
+_Parsed = {}
+_Resolved = {}
+
+
+def GetOptionsString():
+    return """PKG-CONFIG OPTIONS
+  pkg-config-path=<paths> : Additional '.pc' files directories, prepended to PKG_CONFIG_PATH []
+  pkg-config-static=0|1   : Use static link flags ('Libs.private', 'Requires.private')    [0]
+                            (overridden by <package>-static flag)
+  with-<package>=<path>   : Search '.pc' files in <path>/lib/pkgconfig first              []"""
+
+def _SplitPaths(s):
+    return [x for x in (s or "").split(os.pathsep) if x]
+
+def _Multiarch():
+    return (sysconfig.get_config_var("MULTIARCH") or "%s-linux-gnu" % platform.machine())
+
+def DefaultSearchPath():
+    if "PKG_CONFIG_LIBDIR" in os.environ:
+        return _SplitPaths(os.environ["PKG_CONFIG_LIBDIR"])
+    if sys.platform == "win32":
+        return []
+    elif sys.platform == "darwin":
+        return ["/opt/homebrew/lib/pkgconfig", "/usr/local/lib/pkgconfig", "/opt/local/lib/pkgconfig", "/usr/lib/pkgconfig"]
+    else:
+        multiarch = _Multiarch()
+        return ["/usr/local/lib/%s/pkgconfig" % multiarch,
+                "/usr/local/lib/pkgconfig",
+                "/usr/local/share/pkgconfig",
+                "/usr/lib/%s/pkgconfig" % multiarch,
+                "/usr/lib64/pkgconfig",
+                "/usr/lib/pkgconfig",
+                "/usr/share/pkgconfig"]
+
+def SearchPath():
+    paths = _SplitPaths(excons.GetArgument("pkg-config-path", ""))
+    paths += _SplitPaths(os.environ.get("PKG_CONFIG_PATH", ""))
+    paths += DefaultSearchPath()
+    rv = []
+    for path in paths:
+        path = excons.abspath(os.path.expanduser(path))
+        if not path in rv and os.path.isdir(path):
+            rv.append(path)
+    return rv
+
+def _SystemDirs(var, defaults):
+    return set([excons.abspath(x) for x in (_SplitPaths(os.environ[var]) if var in os.environ else defaults)])
+
+def SystemIncludeDirs():
+    # Never pass default include directories explicitly: breaks '#include_next'
+    if "PKG_CONFIG_ALLOW_SYSTEM_CFLAGS" in os.environ:
+        return set()
+    return _SystemDirs("PKG_CONFIG_SYSTEM_INCLUDE_PATH", ["/usr/include"])
+
+def SystemLibraryDirs():
+    if "PKG_CONFIG_ALLOW_SYSTEM_LIBS" in os.environ:
+        return set()
+    defaults = ["/usr/lib", "/lib", "/usr/lib64", "/lib64"]
+    if sys.platform.startswith("linux"):
+        defaults += ["/usr/lib/%s" % _Multiarch(), "/lib/%s" % _Multiarch()]
+    return _SystemDirs("PKG_CONFIG_SYSTEM_LIBRARY_PATH", defaults)
+
+def Find(name):
+    dirs = []
+    _, libdir = excons.GetDirs(name, silent=True)
+    if libdir:
+        dirs.extend([excons.joinpath(libdir, "pkgconfig"), excons.joinpath(os.path.dirname(libdir), "share", "pkgconfig")])
+    dirs.extend(SearchPath())
+    for d in dirs:
+        path = excons.joinpath(d, name + ".pc")
+        if os.path.isfile(path):
+            return path
+    return None
+
+# ===---
+
+def _Expand(s, variables, path):
+    # '$$' escapes '$'
+    def _Replace(m):
+        name = m.group(1)
+        if not name in variables:
+            excons.WarnOnce("Undefined variable '%s' in '%s'" % (name, path), tool="pkgconfig")
+            return ""
+        return variables[name]
+    return "$".join([_VarExp.sub(_Replace, x) for x in s.split("$$")])
+
+def _ParseFile(path):
+    variables = {"pcfiledir": os.path.dirname(excons.abspath(path)).replace("\\", "/")}
+    fields = {}
+    with io.open(path, "r", encoding="UTF-8", errors="replace") as f:
+        lines = f.read().replace("\\\n", " ").split("\n")
+    for line in lines:
+        line = line.split("#")[0].strip()
+        if not line:
+            continue
+        # Fields use ':', variables use '=' (whichever comes first)
+        m = re.match(r"^([A-Za-z0-9_.]+)\s*([:=])\s*(.*)$", line)
+        if m is None:
+            continue
+        key, sep, value = m.group(1), m.group(2), _Expand(m.group(3).strip(), variables, path)
+        if sep == "=":
+            variables[key] = value
+        else:
+            fields[key] = value
+    return {"variables": variables, "fields": fields}
+
+def Parse(path):
+    key = probecache.FileKey(path)
+    if key is None:
+        return None
+    rv = _Parsed.get(key, None)
+    if rv is None:
+        rv = probecache.Memoize("pkgconfig", key, lambda: _ParseFile(path))
+        _Parsed[key] = rv
+    return rv
+
+def ParseRequires(s):
+    # "foo >= 1.0, bar baz < 2" -> [("foo", ">=", "1.0"), ("bar", None, None), ("baz", "<", "2")]
+    rv = []
+    toks = _ReqExp.findall(s or "")
+    i = 0
+    while i < len(toks):
+        name, op, ver = toks[i], None, None
+        if i + 1 < len(toks) and toks[i + 1] in _Ops:
+            op = toks[i + 1]
+            ver = (toks[i + 2] if i + 2 < len(toks) else "")
+            i += 3
+        else:
+            i += 1
+        rv.append((name, op, ver))
+    return rv
+
+def CompareVersions(v0, v1):
+    # rpm style: compare numeric and alphabetic segments in turn, numeric segments are newer
+    s0, s1 = _VerExp.findall(v0), _VerExp.findall(v1)
+    for a, b in zip(s0, s1):
+        if a.isdigit() and b.isdigit():
+            a, b = int(a), int(b)
+        elif a.isdigit() != b.isdigit():
+            return (1 if a.isdigit() else -1)
+        if a != b:
+            return (1 if a > b else -1)
+    return (len(s0) > len(s1)) - (len(s0) < len(s1))
+
+def _Satisfies(version, op, required):
+    if op is None:
+        return True
+    c = CompareVersions(version, required)
+    return {"<": c < 0, "<=": c <= 0, "=": c == 0, "!=": c != 0, ">=": c >= 0, ">": c > 0}[op]
+
+def _Split(s):
+    try:
+        return shlex.split(s, posix=(sys.platform != "win32"))
+    except:
+        return s.split()
+
+# Options taking their value as next argument
+_ArgFlags = ("-isystem", "-idirafter", "-iquote", "-include", "-imacros", "-iprefix", "-iwithprefix", "-isysroot",
+             "-Xclang", "-Xpreprocessor", "-Xlinker", "-arch", "-target", "-framework")
+
+# Position dependent linker options (i.e. abseil's '-Wl,--push-state,--as-needed -latomic -Wl,--pop-state')
+_LinkerSections = (("--push-state", "--pop-state"),
+                   ("--whole-archive", "--no-whole-archive"),
+                   ("--start-group", "--end-group"))
+
+def _LinkerSectionStart(flag):
+    for start, end in _LinkerSections:
+        if flag.startswith("-Wl,") and start in flag.split(","):
+            return end
+    return None
+
+def _Units(flags):
+    # Group flags that must stay together as tuples
+    rv = []
+    i = 0
+    while i < len(flags):
+        flag = flags[i]
+        end = _LinkerSectionStart(flag)
+        if end is not None:
+            j = i + 1
+            while j < len(flags) and not (flags[j].startswith("-Wl,") and end in flags[j].split(",")):
+                j += 1
+            rv.append(tuple(flags[i:j+1]))
+            i = j + 1
+        elif flag in _ArgFlags and i + 1 < len(flags):
+            rv.append((flag, flags[i+1]))
+            i += 2
+        else:
+            rv.append(flag)
+            i += 1
+    return rv
+
+# ===---
+
+def Package(name):
+    path = Find(name)
+    if path is None:
+        return None
+    return Parse(path)
+
+def Version(name):
+    pc = Package(name)
+    return (None if pc is None else pc["fields"].get("Version", ""))
+
+def Variable(name, var):
+    pc = Package(name)
+    return (None if pc is None else pc["variables"].get(var, None))
+
+def Exists(requires):
+    return (Flags(requires, silent=True) is not None)
+
+def Flags(requires, static=False, silent=False):
+    # Return a dictionary of construction variables for env.Append, or None when requirements aren't met
+    #   'LIBFLAGS' holds position dependent linker options that must follow libraries
+    key = (requires, static, tuple(SearchPath()))
+    if key in _Resolved:
+        return _Resolved[key]
+
+    order = []
+    packages = {}
+    privates = {}
+    failed = []
+
+    def _Visit(name, op, ver, private):
+        pc = Package(name)
+        if pc is None:
+            failed.append("Package '%s' not found" % name)
+            return
+        version = pc["fields"].get("Version", "")
+        if not _Satisfies(version, op, ver):
+            failed.append("Package '%s' %s doesn't satisfy '%s %s'" % (name, version, op, ver))
+            return
+        if name in packages:
+            if privates[name] and not private:
+                # Also a public dependency: its link flags are required after all
+                privates[name] = False
+                for (n, _, _), p in _Dependencies(pc):
+                    _Visit(n, None, None, p)
+            return
+        packages[name] = pc
+        privates[name] = private
+        for (n, o, v), p in _Dependencies(pc):
+            _Visit(n, o, v, private or p)
+        order.append(name)
+
+    def _Dependencies(pc):
+        deps = [(x, False) for x in ParseRequires(pc["fields"].get("Requires", ""))]
+        # Private requirements compile flags are always needed, their link flags only for static linking
+        deps += [(x, True) for x in ParseRequires(pc["fields"].get("Requires.private", ""))]
+        return deps
+
+    # Reversed so that requirements keep their order once the dependency order is reversed below
+    for name, op, ver in reversed(ParseRequires(requires)):
+        _Visit(name, op, ver, False)
+
+    if failed:
+        if not silent:
+            for msg in failed:
+                excons.WarnOnce(msg, tool="pkgconfig")
+        _Resolved[key] = None
+        return None
+
+    sysinc = SystemIncludeDirs()
+    syslib = SystemLibraryDirs()
+    units = {"CPPPATH": [], "CPPDEFINES": [], "CCFLAGS": [], "LIBPATH": [], "LINKFLAGS": [], "LIBFLAGS": []}
+
+    def _Add(var, val):
+        if not val in units[var]:
+            units[var].append(val)
+
+    # Dependents first so that static libraries link in the right order
+    libs = []
+    for name in reversed(order):
+        fields = packages[name]["fields"]
+        private = privates[name]
+        cflags = _Split(fields.get("Cflags", ""))
+        if static:
+            cflags += _Split(fields.get("Cflags.private", ""))
+        for flag in _Units(cflags):
+            if isinstance(flag, tuple):
+                _Add("CCFLAGS", flag)
+            elif flag.startswith("-I") or flag.startswith("/I"):
+                path = flag[2:]
+                if not excons.abspath(path) in sysinc:
+                    _Add("CPPPATH", path)
+            elif flag.startswith("-D") or flag.startswith("/D"):
+                spl = flag[2:].split("=", 1)
+                _Add("CPPDEFINES", (spl[0] if len(spl) == 1 else (spl[0], spl[1])))
+            else:
+                _Add("CCFLAGS", flag)
+
+        if private and not static:
+            continue
+        lflags = _Split(fields.get("Libs", ""))
+        if static:
+            lflags += _Split(fields.get("Libs.private", ""))
+        for flag in _Units(lflags):
+            if isinstance(flag, tuple):
+                # Options with an argument or linker state sections: keep them whole and in order
+                _Add("LIBFLAGS" if _LinkerSectionStart(flag[0]) else "LINKFLAGS", flag)
+            elif flag.startswith("-L") or flag.upper().startswith("/LIBPATH:"):
+                path = (flag[2:] if flag.startswith("-L") else flag[9:])
+                if not excons.abspath(path) in syslib:
+                    _Add("LIBPATH", path)
+            elif flag.startswith("-l"):
+                libs.append(flag[2:])
+            elif flag.endswith(".lib") or flag.endswith(".a") or os.path.isabs(flag):
+                libs.append(flag)
+            else:
+                _Add("LINKFLAGS", flag)
+
+    rv = {}
+    for k, vals in units.items():
+        rv[k] = []
+        for val in vals:
+            if isinstance(val, tuple) and k != "CPPDEFINES":
+                rv[k].extend(val)
+            else:
+                rv[k].append(val)
+
+    # Keep last occurence of repeated libraries (i.e. shared by several packages)
+    rv["LIBS"] = []
+    for idx, lib in enumerate(libs):
+        if not lib in libs[idx+1:]:
+            rv["LIBS"].append(lib)
+
+    rv["VERSIONS"] = dict([(name, packages[name]["fields"].get("Version", "")) for name in order])
+
+    _Resolved[key] = rv
+    return rv
+
+def Require(requires, static=None):
+    # requires: pkg-config style requirements string (i.e. "foo >= 1.2, bar")
+    if static is None:
+        default = excons.GetArgument("pkg-config-static", 0, int)
+        static = all([excons.GetArgument("%s-static" % x[0], default, int) != 0 for x in ParseRequires(requires)])
+
+    flags = Flags(requires, static=static)
+    if flags is None:
+        excons.WarnOnce("Could not resolve '%s'" % requires, tool="pkgconfig")
+        sys.exit(1)
+
+    def _RequirePkgConfig(env):
+        env.AppendUnique(CPPPATH=flags["CPPPATH"][:], LIBPATH=flags["LIBPATH"][:])
+        # Escape '$' from SCons variable substitution
+        defs = [(x if isinstance(x, excons.anystring) else (x[0], x[1].replace("$", "$$"))) for x in flags["CPPDEFINES"]]
+        env.Append(CPPDEFINES=defs, CCFLAGS=flags["CCFLAGS"][:], LINKFLAGS=flags["LINKFLAGS"][:])
+        env.Append(LIBS=[(env.File(x) if os.path.isabs(x) else x) for x in flags["LIBS"]])
+        if flags["LIBFLAGS"]:
+            # Linker sections can't go through LIBS: add them after libraries
+            env.Append(PKGCONFIG_LIBFLAGS=flags["LIBFLAGS"][:])
+            if not "$PKGCONFIG_LIBFLAGS" in env["_LIBFLAGS"]:
+                env["_LIBFLAGS"] = env["_LIBFLAGS"] + " $PKGCONFIG_LIBFLAGS"
+
+        excons.AddHelpOptions(pkgconfig=GetOptionsString())
+
+    return _RequirePkgConfig
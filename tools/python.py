@@ -27,48 +27,82 @@ import SCons.Script # pylint: disable=import-error
 import os
 import re
 import sys
-import subprocess
+import json
 import excons
-import distutils
-import distutils.sysconfig
+from excons import probecache
 
 
 def GetOptionsString():
     return """PYTHON OPTIONS
   with-python=<str> : Python version or prefix [current interpreter]"""
 
+# Interpreter configuration, evaluated in the current interpreter or in a subprocess of the
+#   target one (keep python 2 compatible)
+_InfoCode = """
+import sys, sysconfig
+def _Info():
+    v = sysconfig.get_config_var
+    ver = "%d.%d" % sys.version_info[:2]
+    return {"version": ver,
+            "incdir": sysconfig.get_paths()["include"],
+            "libdir": v("LIBDIR") or "",
+            "ldversion": v("LDVERSION") or v("VERSION") or ver,
+            "ldlibrary": v("LDLIBRARY") or "",
+            "shared": bool(v("Py_ENABLE_SHARED")),
+            "ext": v("EXT_SUFFIX") or v("SO") or "",
+            "prefix": getattr(sys, "base_exec_prefix", sys.exec_prefix),
+            "framework": v("PYTHONFRAMEWORK") or "",
+            "frameworkprefix": v("PYTHONFRAMEWORKPREFIX") or "",
+            "cflags": v("CFLAGS") or "",
+            "linkforshared": v("LINKFORSHARED") or ""}
+"""
+
+_localInfo = None
+
+def _GetLocalInfo():
+    global _localInfo
+
+    if _localInfo is None:
+        ns = {}
+        exec(_InfoCode, ns) # pylint: disable=exec-used
+        _localInfo = ns["_Info"]()
+    return _localInfo
+
+def _GetInterpreterInfo(pythonPath):
+    # One subprocess per interpreter, result stored on disk until the interpreter changes
+    if os.path.realpath(pythonPath) == os.path.realpath(sys.executable):
+        return _GetLocalInfo()
+
+    key = probecache.FileKey(pythonPath)
+    if key is None:
+        return None
+
+    def _Query():
+        cmd = [pythonPath, "-c", _InfoCode + "\nimport json\nprint(json.dumps(_Info()))\n"]
+        [(rc, out)] = probecache.Spawn([cmd], shell=False)
+        if rc != 0:
+            return None
+        try:
+            return json.loads(out.strip().split("\n")[-1])
+        except ValueError:
+            return None
+
+    return probecache.Memoize("python", key, _Query)
+
 def _GetPythonVersionOSX(pythonPath):
     # On osx, pythonPath must be the path to the python framework
     # i.e.  with-python=/System/Library/Frameworks/Python.framework
-    p = subprocess.Popen("ls -l %s/Versions | grep Current" % pythonPath, shell=True, stdout=subprocess.PIPE)
-    out, _ = p.communicate()
-    m = re.search(r"Current\s+->\s+(%s/Versions/)?([0-9\.]+)" % pythonPath, out.decode("ascii") if sys.version_info.major >= 3 else out)
-    if m is not None:
-        return m.group(2)
-    return None
-
-def _GetPythonVersionWIN(pythonPath):
-    # On windows, pythonPath must be the path to the python executable
-    # i.e.  with-python=C:/Python27/python.exe
-    dn = os.path.dirname(pythonPath)
-    fl = excons.glob(excons.joinpath(dn, "python*.dll"))
-    if len(fl) == 1:
-        m = re.match(r"python(\d)(\d)\.dll", os.path.basename(fl[0]), re.IGNORECASE)
-        if m is not None:
-            return "%s.%s" % (m.group(1), m.group(2))
-    return None
-
-def _GetPythonVersionUNIX(pythonPath):
-    # On unix, pythonPath must be the path to the python executable
-    # i.e.  with-python=/usr/local/bin/python
-    p = subprocess.Popen("ldd %s | grep libpython" % pythonPath, shell=True, stdout=subprocess.PIPE)
-    out, _ = p.communicate()
-    m = re.search(r"libpython([0-9\.]+m?)\.so", out.decode("ascii") if sys.version_info.major >= 3 else out)
+    try:
+        cur = os.readlink("%s/Versions/Current" % pythonPath)
+    except OSError:
+        return None
+    m = re.match(r"^([0-9\.]+)$", os.path.basename(cur.rstrip("/")))
     if m is not None:
         return m.group(1)
     return None
 
 _specCache = {}
+_specInfo = {}
 
 def _GetPythonSpec(specString):
     if specString in _specCache:
@@ -76,6 +110,7 @@ def _GetPythonSpec(specString):
 
     spec = None
     specErr = ""
+    info = None
 
     plat = str(SCons.Script.Platform())
 
@@ -124,18 +159,19 @@ def _GetPythonSpec(specString):
                 spec = (ver, incdir, libdir, lib)
 
         else:
-            searchPath = distutils.sysconfig.get_config_var("BINDIR")
-            spec = (ver, searchPath)
-
-            if spec:
-                ver, prefix = spec
-                incdir = distutils.sysconfig.get_python_inc()
-                libdir = distutils.sysconfig.get_config_var("LIBDIR")
-                lib = "python%s" % distutils.sysconfig.get_config_var("LDVERSION")
-                spec = (ver, incdir, libdir, lib)
+            # Look for pythonX.Y in PATH, default to current interpreter
+            pythonPath = excons.Which(r"python%s$" % re.escape(ver))
+            info = (_GetInterpreterInfo(pythonPath) if pythonPath else None)
+            if info is None or info["version"] != ver:
+                info = _GetLocalInfo()
+            if info["version"] == ver:
+                spec = (ver, info["incdir"], info["libdir"], "python%s" % info["ldversion"])
+            else:
+                info = None
+                specErr += "\n  Cannot find python%s in PATH" % ver
 
         if spec is None:
-            curver = str(distutils.sysconfig.get_python_version())
+            curver = _GetLocalInfo()["version"]
             specErr += "\n"
             if curver != ver:
                 excons.PrintOnce("Couldn't find stock python %s.%sCurrent version doesn't match (%s), aborting build." % (ver, specErr, curver), tool="python")
@@ -184,8 +220,11 @@ def _GetPythonSpec(specString):
                         specErr += "\n  Cannot find python %s include directory in %s" % (ver, specString)
 
         elif plat == "win32":
-            ver = _GetPythonVersionWIN(specString)
-            if ver is not None:
+            # On windows, specString must be the path to the python executable
+            # i.e.  with-python=C:/Python27/python.exe
+            info = _GetInterpreterInfo(specString)
+            if info is not None:
+                ver = info["version"]
                 d = os.path.dirname(specString)
                 incdir = excons.joinpath(d, "include")
                 libdir = excons.joinpath(d, "libs")
@@ -193,16 +232,13 @@ def _GetPythonSpec(specString):
                 spec = (ver, incdir, libdir, lib)
 
         else:
-            ver = _GetPythonVersionUNIX(specString)
-            if ver is not None:
-                # not specString but 2 dirs up (as specString is the path to the python executable)
-                d = os.path.dirname(specString)
-                if os.path.basename(d) == "bin":
-                    d = os.path.dirname(d)
-                    incdir = excons.joinpath(d, "include", "python%s" % ver)
-                    libdir = excons.joinpath(d, ("lib64" if excons.Build64() else "lib"))
-                    lib = "python%s" % ver
-                    spec = (ver, incdir, libdir, lib)
+            # On unix, specString must be the path to the python executable
+            # i.e.  with-python=/usr/local/bin/python
+            info = _GetInterpreterInfo(specString)
+            if info is not None:
+                spec = (info["version"], info["incdir"], info["libdir"], "python%s" % info["ldversion"])
+            else:
+                specErr += "\n  Cannot get configuration of %s" % specString
 
         if spec is None:
             specErr += "\n"
@@ -232,10 +268,9 @@ def _GetPythonSpec(specString):
                     if not os.path.isfile(excons.joinpath(libdir, "%s.lib" % lib)):
                         excons.PrintOnce("Cannot find '%s'" % (excons.joinpath(libdir, "%s.lib" % lib)), tool="python")
                         spec = None
-                else:
-                    ldlib = distutils.sysconfig.get_config_var("LDLIBRARY")
-                    if not distutils.sysconfig.get_config_var("Py_ENABLE_SHARED"):
-                        excons.PrintOnce("Cannot find '%s'" % ldlib, tool="python")
+                elif info is not None:
+                    if not info["shared"]:
+                        excons.PrintOnce("Cannot find '%s'" % info["ldlibrary"], tool="python")
                         spec = None
 
         if spec is None:
@@ -245,6 +280,7 @@ def _GetPythonSpec(specString):
     excons.PrintOnce("Resolved python for \"%s\": %s" % (specString, ('<current>' if spec is None else spec)), tool="python")
 
     _specCache[specString] = spec
+    _specInfo[specString] = info
 
     return spec
 
@@ -256,7 +292,7 @@ def Version():
         if rv is not None:
             return rv[0]
 
-    return str(distutils.sysconfig.get_python_version())
+    return _GetLocalInfo()["version"]
 
 def Require(e, ignoreLinkFlags=False):
     po = excons.GetArgument("with-python")
@@ -285,27 +321,28 @@ def Require(e, ignoreLinkFlags=False):
 
     # Default settings: use the python that this script runs on
 
-    pyver = distutils.sysconfig.get_python_version()
+    info = _GetLocalInfo()
+    pyver = info["version"]
     e.Append(CCFLAGS=" -DPY_VER=%s" % pyver)
-    e.Append(CPPPATH=[distutils.sysconfig.get_python_inc()])
+    e.Append(CPPPATH=[info["incdir"]])
 
-    if distutils.sysconfig.get_config_var("PYTHONFRAMEWORK"):
+    if info["framework"]:
         if not ignoreLinkFlags:
-            fwdir = distutils.sysconfig.get_config_var("PYTHONFRAMEWORKPREFIX")
-            fwname = distutils.sysconfig.get_config_var("PYTHONFRAMEWORK")
+            fwdir = info["frameworkprefix"]
+            fwname = info["framework"]
             if _GetPythonVersionOSX("%s/%s.framework" % (fwdir, fwname)) != pyver:
                 e.Append(LINKFLAGS=" %s/%s.framework/Versions/%s/%s" % (fwdir, fwname, pyver, fwname))
             else:
                 e.Append(LINKFLAGS=" -F%s -framework %s" % (fwdir, fwname))
     else:
         if str(SCons.Script.Platform()) == "win32":
-            e.Append(LIBPATH=[distutils.sysconfig.PREFIX+'\\libs'])
+            e.Append(LIBPATH=[info["prefix"]+'\\libs'])
             e.Append(LIBS=["python%s" % pyver.replace(".", "")])
         else:
-            pyver = distutils.sysconfig.get_config_var("LDVERSION")
-            e.Append(CCFLAGS=" %s" % distutils.sysconfig.get_config_var("CFLAGS"))
+            pyver = info["ldversion"]
+            e.Append(CCFLAGS=" %s" % info["cflags"])
             if not ignoreLinkFlags:
-                e.Append(LINKFLAGS=" %s" % distutils.sysconfig.get_config_var("LINKFORSHARED"))
+                e.Append(LINKFLAGS=" %s" % info["linkforshared"])
                 e.Append(LIBS=["python%s" % pyver])
 
     excons.AddHelpOptions(python=GetOptionsString())
@@ -321,7 +358,15 @@ def ModulePrefix():
     return "lib/python/"
 
 def ModuleExtension():
-    return distutils.sysconfig.get_config_var("SO" if sys.version_info.major < 3 else "EXT_SUFFIX")
+    po = excons.GetArgument("with-python")
+
+    if po is not None:
+        _GetPythonSpec(po)
+        info = _specInfo.get(po, None)
+        if info is not None:
+            return info["ext"]
+
+    return _GetLocalInfo()["ext"]
 
 
 _cython = ""
@@ -38,6 +38,14 @@ def GetOptionsString():
   tbb-suffix=<str>    : TBB library name suffix.   ['']
                         (ignored when tbb-name is set)"""
 
+def LibraryName(name="tbb"):
+    # Also used for other TBB libraries (i.e. 'tbbmalloc'), 'tbb-name' only overrides the main one
+    if name == "tbb":
+        tbblibname = excons.GetArgument("tbb-name", None)
+        if tbblibname:
+            return tbblibname
+    return "%s%s%s" % (excons.GetArgument("tbb-prefix", ""), name, excons.GetArgument("tbb-suffix", ""))
+
 def Require(env):
     tbbinc, tbblib = excons.GetDirs("tbb")
 
@@ -51,10 +59,6 @@ def Require(env):
     # Any specific defines?
     #env.Append(CPPDEFINES=[])
 
-    tbblibname = excons.GetArgument("tbb-name", None)
-    if not tbblibname:
-        tbblibname = "%stbb%s" % (excons.GetArgument("tbb-prefix", ""), excons.GetArgument("tbb-suffix", ""))
-
-    excons.Link(env, tbblibname, static=static, force=True, silent=True)
+    excons.Link(env, LibraryName(), static=static, force=True, silent=True)
 
     excons.AddHelpOptions(tbb=GetOptionsString())
@@ -26,7 +26,6 @@
 import SCons.Script # pylint: disable=import-error
 import excons
 import sys
-import io
 import re
 import os
 
@@ -54,26 +53,22 @@ def Version(asString=True, nice=False):
 
     vraybase = excons.joinpath(vrayinc, "vraybase.h")
 
-    if os.path.isfile(vraybase):
-        defexp = re.compile(r"^\s*#define\s+VRAY_DLL_VERSION\s+(0x[a-fA-F0-9]+)")
-        with io.open(vraybase, "r", encoding="UTF-8", newline="\n") as f:
-            for line in f.readlines():
-                m = defexp.match(line)
-                if m:
-                    #rv = (int(m.group(1), 16) if not asString else m.group(1)[2:])
-                    rv = m.group(1)[2:]
-                    if nice:
-                        iv = int(rv)
-                        major = iv / 10000
-                        minor = (iv % 10000) / 100
-                        patch = iv % 100
-                        rv = (major, minor, patch)
-                        if asString:
-                            rv = "%d.%d.%d" % rv
-                    else:
-                        if not asString:
-                            rv = int(rv)
-                    return rv
+    m = re.match(r"^0x([a-fA-F0-9]+)", excons.HeaderDefines(vraybase, "VRAY_DLL_VERSION").get("VRAY_DLL_VERSION", ""))
+    if m:
+        #rv = (int(m.group(1), 16) if not asString else m.group(1))
+        rv = m.group(1)
+        if nice:
+            iv = int(rv)
+            major = iv / 10000
+            minor = (iv % 10000) / 100
+            patch = iv % 100
+            rv = (major, minor, patch)
+            if asString:
+                rv = "%d.%d.%d" % rv
+        else:
+            if not asString:
+                rv = int(rv)
+        return rv
 
     return ("" if asString else (0 if not nice else (0, 0, 0)))
 